@@ -6,16 +6,27 @@ Application web Flask servant de backend pour le système de recherche BTP.
 Cette version inclut toutes les routes nécessaires pour une communication
 complète avec le client Excel.
 """
+import hashlib
 import logging
+import threading
+import numpy as np
 import pandas as pd
 import json
-from flask import Flask, request, jsonify, Response
+from collections import OrderedDict
+from flask import Flask, request, jsonify, Response, stream_with_context
 from flask_cors import CORS
 from pathlib import Path
 
 # Import des modules et configurations locaux
-from config import SERVER_CONFIG, PATHS
-from search_engine import BTCSearchEngine
+try:
+    # Parseur CSV C++ multi-thread, nettement plus rapide que pandas sur
+    # les gros catalogues ; dépendance optionnelle, repli pandas sinon.
+    import pyarrow.csv as pacsv
+except ImportError:
+    pacsv = None
+
+from config import PATHS, MODEL_CONFIG
+from search_engine import BTCSearchEngine, LibraryIndex, quantize_embeddings
 from dictionary_manager import DictionaryManager
 
 # Configuration du logging pour un meilleur suivi
@@ -30,33 +41,106 @@ logging.info("Initialisation du système de recherche BTP...")
 search_engine = BTCSearchEngine()
 dictionary_manager = DictionaryManager()
 
-# Cache en mémoire pour les bibliothèques chargées
-loaded_libraries: dict[str, pd.DataFrame] = {}
+# Cache en mémoire pour les bibliothèques chargées : un LibraryIndex par
+# clé (DataFrame + embeddings + structures de recherche pré-calculées).
+# OrderedDict utilisé en LRU : au-delà de MAX_CACHED_LIBRARIES entrées, la
+# bibliothèque la moins récemment utilisée est évincée (les matrices
+# d'embeddings représentent l'essentiel de la RAM du serveur).
+MAX_CACHED_LIBRARIES = 4
+loaded_libraries: OrderedDict[str, LibraryIndex] = OrderedDict()
 current_library_key: str | None = None
 
+# Verrous de chargement : un verrou par clé pour que deux requêtes concurrentes
+# sur la même bibliothèque ne lancent pas deux encodages complets, tout en
+# laissant des bibliothèques distinctes se charger en parallèle.
+_lib_lock = threading.Lock()
+_per_key_locks: dict[str, threading.Lock] = {}
+
 # --- Fonctions Utilitaires ---
 
 def create_json_response(data, status_code=200):
-    """Crée une réponse Flask en s'assurant que l'encodage est UTF-8."""
-    json_string = json.dumps(data, ensure_ascii=False, indent=2)
+    """Crée une réponse Flask en s'assurant que l'encodage est UTF-8.
+
+    La sortie est compacte par défaut (l'indentation doublait le volume
+    émis sur chaque requête) ; passer `?pretty=1` pour une sortie lisible.
+    """
+    if request.args.get('pretty') == '1':
+        json_string = json.dumps(data, ensure_ascii=False, indent=2)
+    else:
+        json_string = json.dumps(data, ensure_ascii=False, separators=(',', ':'))
     return Response(json_string, content_type='application/json; charset=utf-8', status=status_code)
 
+def create_etag_response(data):
+    """Réponse JSON avec ETag : les clients Excel sondent /status et
+    /libraries en boucle ; si l'état n'a pas changé, un 304 sans corps
+    remplace la sérialisation et l'envoi du JSON."""
+    etag = hashlib.md5(repr(data).encode()).hexdigest()
+    if request.headers.get('If-None-Match') == etag:
+        return Response(status=304)
+    response = create_json_response(data)
+    response.headers['ETag'] = etag
+    return response
+
+# Cache du scan des bibliothèques : invalidé quand le mtime du dossier change.
+_libraries_cache: tuple[int, list[str]] | None = None
+
 def get_available_libraries() -> list[str]:
-    """Retourne la liste des noms de bibliothèques CSV disponibles."""
+    """Retourne la liste des noms de bibliothèques CSV disponibles.
+
+    Le glob (un syscall par entrée du dossier) n'est relancé que si le
+    mtime du dossier a changé : les appels répétés de /status et /search
+    se réduisent à un seul stat().
+    """
+    global _libraries_cache
     if not PATHS['bibliotheque'].exists():
         return []
-    return [p.stem for p in PATHS['bibliotheque'].glob("*.csv")]
+    dir_mtime = PATHS['bibliotheque'].stat().st_mtime_ns
+    if _libraries_cache is None or _libraries_cache[0] != dir_mtime:
+        _libraries_cache = (dir_mtime, sorted(p.stem for p in PATHS['bibliotheque'].glob("*.csv")))
+    return _libraries_cache[1]
+
+def _embeddings_cache_path(library_name: str, price_type: str, csv_path: Path) -> Path:
+    """Chemin du cache disque des embeddings, invalidé si le CSV ou le modèle change."""
+    key = hashlib.md5(
+        f"{library_name}|{price_type}|{csv_path.stat().st_mtime_ns}|{MODEL_CONFIG['name']}|int8".encode()
+    ).hexdigest()
+    return PATHS['cache'] / f"embeddings_{key}.npy"
+
+def load_library(library_name: str, price_type: str = "Moyen") -> LibraryIndex | None:
+    """Charge une bibliothèque depuis un fichier CSV, la nettoie et calcule les embeddings.
 
-def load_library(library_name: str, price_type: str = "Moyen") -> pd.DataFrame | None:
-    """Charge une bibliothèque depuis un fichier CSV, la nettoie et calcule les embeddings."""
+    Retourne le LibraryIndex construit par search_engine.prepare() :
+    DataFrame, matrice d'embeddings (N, D) contiguë, tokens et index
+    inversé pré-calculés — tout le travail dépendant du catalogue est fait
+    ici, une seule fois.
+    """
     global loaded_libraries, current_library_key
     cache_key = f"{library_name}_{price_type}"
 
     if cache_key in loaded_libraries:
         logging.info(f"Utilisation de la bibliothèque '{cache_key}' depuis le cache.")
+        loaded_libraries.move_to_end(cache_key)
         current_library_key = cache_key
         return loaded_libraries[cache_key]
 
+    # Le verrou global ne protège que la création du verrou par clé
+    with _lib_lock:
+        key_lock = _per_key_locks.setdefault(cache_key, threading.Lock())
+
+    with key_lock:
+        # Double vérification : un autre thread a pu finir le chargement
+        # pendant que nous attendions le verrou.
+        if cache_key in loaded_libraries:
+            logging.info(f"Utilisation de la bibliothèque '{cache_key}' depuis le cache.")
+            loaded_libraries.move_to_end(cache_key)
+            current_library_key = cache_key
+            return loaded_libraries[cache_key]
+        return _load_library_locked(library_name, price_type, cache_key)
+
+def _load_library_locked(library_name: str, price_type: str, cache_key: str) -> LibraryIndex | None:
+    """Travail effectif de chargement, appelé sous le verrou de la clé."""
+    global current_library_key
+
     csv_path = PATHS['bibliotheque'] / f"{library_name}.csv"
     if not csv_path.exists():
         logging.error(f"Fichier bibliothèque introuvable : {csv_path}")
@@ -64,26 +148,90 @@ def load_library(library_name: str, price_type: str = "Moyen") -> pd.DataFrame |
 
     try:
         logging.info(f"Chargement de la bibliothèque '{library_name}'...")
-        column_names = ['Code', 'Désignation', 'Unité', 'Minimum', 'Moyen', 'Maximum', 'Extra']
-        df = pd.read_csv(csv_path, encoding='utf-8', sep=';', skiprows=4, names=column_names, on_bad_lines='skip')
-        
-        df = df[['Désignation', 'Unité', price_type]].copy()
+        # Les CSV des mercuriales ont 6 champs par ligne : déclarer une
+        # colonne de trop ferait rejeter chaque ligne par pyarrow (mauvais
+        # nombre de colonnes -> invalid_row_handler -> catalogue vide)
+        column_names = ['Code', 'Désignation', 'Unité', 'Minimum', 'Moyen', 'Maximum']
+        if pacsv is not None:
+            table = pacsv.read_csv(
+                csv_path,
+                read_options=pacsv.ReadOptions(skip_rows=4, column_names=column_names, encoding='utf8'),
+                parse_options=pacsv.ParseOptions(delimiter=';', invalid_row_handler=lambda row: 'skip'),
+                # strings_can_be_null : les champs vides deviennent des nulls
+                # comme avec pandas, sinon ni dropna ni fillna('N/A') ne les
+                # verraient (pyarrow lit '' par défaut dans les colonnes texte)
+                convert_options=pacsv.ConvertOptions(include_columns=['Désignation', 'Unité', price_type],
+                                                     strings_can_be_null=True),
+            )
+            df = table.to_pandas(types_mapper=pd.ArrowDtype)
+        else:
+            # Lecture typée avec le moteur C : seules les 3 colonnes utiles sont
+            # matérialisées, déjà en dtype str (plus de .astype(str) a posteriori).
+            df = pd.read_csv(
+                csv_path, encoding='utf-8', sep=';', skiprows=4, names=column_names,
+                usecols=['Désignation', 'Unité', price_type],
+                dtype={'Désignation': 'string', 'Unité': 'string', price_type: 'string'},
+                engine='c', on_bad_lines='skip',
+            )
         df.rename(columns={price_type: 'Prix'}, inplace=True)
         df.dropna(subset=['Désignation'], inplace=True)
 
-        df['Désignation'] = df['Désignation'].astype(str).str.strip()
-        df['Unité'] = df['Unité'].astype(str).str.strip()
-        df['Prix'] = df['Prix'].apply(lambda x: str(x).strip() if pd.notna(x) else "N/A")
-        
-        df = df[df['Désignation'].str.len() > 3].drop_duplicates(subset=['Désignation']).reset_index(drop=True)
+        df['Désignation'] = df['Désignation'].str.strip()
+        df['Unité'] = df['Unité'].str.strip().fillna('')
+        df['Prix'] = df['Prix'].str.strip().fillna('N/A')
+
+
+        # Filtre longueur + déduplication en une passe vectorisée
+        mask = df['Désignation'].str.len() > 3
+        df = df.loc[mask].drop_duplicates(subset=['Désignation']).reset_index(drop=True)
+
+        cache_file = _embeddings_cache_path(library_name, price_type, csv_path)
+        if MODEL_CONFIG['cache_embeddings'] and cache_file.exists():
+            # Démarrage à froid : un simple mmap du cache disque remplace
+            # le passage complet dans le transformer.
+            logging.info(f"Embeddings chargés depuis le cache disque : {cache_file.name}")
+            embeddings = np.load(cache_file, mmap_mode='r')
+        else:
+            logging.info(f"Pré-calcul des embeddings pour {len(df)} articles...")
+            # "Smart batching" : encoder par longueur croissante limite le padding
+            # de chaque mini-batch à son propre maximum (au lieu du maximum global).
+            order = np.argsort(df['Désignation'].str.len().values, kind='stable')
+            texts = df['Désignation'].iloc[order].tolist()
+            batch_size = 64
+            dim = search_engine.model.get_sentence_embedding_dimension()
+            # Tampon de sortie pré-alloué : chaque batch est encodé puis
+            # quantifié directement dans sa tranche, sans liste intermédiaire
+            # ni empilement final.
+            embeddings = np.empty((len(texts), dim), dtype=np.int8)
+            for start in range(0, len(texts), batch_size):
+                batch = search_engine.model.encode(
+                    texts[start:start + batch_size],
+                    batch_size=batch_size,
+                    show_progress_bar=False,
+                    convert_to_numpy=True,
+                    normalize_embeddings=True,
+                )
+                embeddings[start:start + len(batch)] = quantize_embeddings(batch)
+            # Remet les embeddings dans l'ordre d'origine du DataFrame
+            embeddings = embeddings[np.argsort(order, kind='stable')]
+            if MODEL_CONFIG['cache_embeddings']:
+                np.save(cache_file, embeddings)
+        # Matrice (N, D) int8 contiguë : 4x moins de bande passante que le
+        # float32 sur le produit matriciel de similarité, un seul appel BLAS.
+        emb_matrix = np.ascontiguousarray(embeddings, dtype=np.int8)
+
+        # Tokenisation et index inversé faits une fois ici plutôt qu'à
+        # chaque requête
+        library = search_engine.prepare(df, emb_matrix)
 
-        logging.info(f"Pré-calcul des embeddings pour {len(df)} articles...")
-        df['embeddings'] = list(search_engine.model.encode(df['Désignation'].tolist(), show_progress_bar=True))
-        
-        loaded_libraries[cache_key] = df
+        loaded_libraries[cache_key] = library
+        loaded_libraries.move_to_end(cache_key)
+        while len(loaded_libraries) > MAX_CACHED_LIBRARIES:
+            evicted_key, _ = loaded_libraries.popitem(last=False)
+            logging.info(f"Bibliothèque '{evicted_key}' évincée du cache (LRU).")
         current_library_key = cache_key
         logging.info(f"Bibliothèque '{cache_key}' chargée avec {len(df)} articles.")
-        return df
+        return library
 
     except Exception as e:
         logging.error(f"Erreur lors du chargement de la bibliothèque '{library_name}': {e}")
@@ -111,7 +259,7 @@ def home():
 @app.route('/status', methods=['GET'])
 def status():
     """Endpoint pour vérifier l'état du serveur."""
-    return create_json_response({
+    return create_etag_response({
         "status": "online",
         "current_library": current_library_key,
         "available_libraries": get_available_libraries(),
@@ -122,7 +270,7 @@ def status():
 @app.route('/libraries', methods=['GET'])
 def list_libraries():
     """Liste les bibliothèques disponibles."""
-    return create_json_response(get_available_libraries())
+    return create_etag_response(get_available_libraries())
 
 @app.route('/search', methods=['GET'])
 def search():
@@ -135,11 +283,22 @@ def search():
     if not library_name:
         return create_json_response({"error": "Le paramètre 'library' est requis."}, 400)
 
-    df = load_library(library_name, price_type)
-    if df is None:
+    library = load_library(library_name, price_type)
+    if library is None:
         return create_json_response({"error": f"La bibliothèque '{library_name}' n'a pas pu être chargée."}, 404)
 
-    results = search_engine.search(df, query, limit)
+    results = search_engine.search(library, query, limit)
+
+    if request.args.get('stream') == '1':
+        # Flux NDJSON : une ligne JSON par résultat, sérialisée et envoyée
+        # au fil de l'eau au lieu d'un unique corps JSON — le premier
+        # résultat part sans attendre la sérialisation des suivants. Le
+        # client Excel garde le tableau JSON classique par défaut.
+        def generate():
+            for result in results:
+                yield json.dumps(result, ensure_ascii=False, separators=(',', ':')) + '\n'
+        return Response(stream_with_context(generate()),
+                        content_type='application/x-ndjson; charset=utf-8')
     return create_json_response(results)
 
 @app.errorhandler(404)
@@ -171,7 +330,19 @@ def load_startup_library():
     if available_libs:
         load_library(available_libs[0])
 
-if __name__ == '__main__':
-    load_startup_library()
-    logging.info(f"Démarrage du serveur Flask sur {SERVER_CONFIG['host']}:{SERVER_CONFIG['port']}")
-    app.run(host=SERVER_CONFIG['host'], port=SERVER_CONFIG['port'], debug=SERVER_CONFIG['debug'])
\ No newline at end of file
+def warm_libraries_in_background():
+    """Pré-charge toutes les bibliothèques dans un thread d'arrière-plan.
+
+    Le serveur répond dès le bind du port ; le thread remplit le cache
+    (dans la limite LRU) pendant ce temps. Les requêtes qui arrivent en
+    cours de chauffe partagent le verrou par clé de load_library, donc
+    rien n'est encodé deux fois.
+    """
+    def _warm_all():
+        for name in get_available_libraries():
+            load_library(name)
+
+    threading.Thread(target=_warm_all, name='library-warmup', daemon=True).start()
+
+# Le démarrage se fait via un serveur WSGI de production, voir wsgi.py :
+#   gunicorn -w 1 -k gthread --threads 8 -b 0.0.0.0:7860 wsgi:app
\ No newline at end of file
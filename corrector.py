@@ -7,6 +7,7 @@ en se basant sur un dictionnaire de corrections défini dans un fichier JSON.
 """
 import json
 import logging
+import pickle
 from pathlib import Path
 
 # Import des modules locaux
@@ -24,20 +25,46 @@ class Corrector:
         """
         Charge le fichier JSON et crée un dictionnaire inversé pour une recherche rapide.
         Ex: {"semell": "semelle", "semelles": "semelle"}
+
+        Le dictionnaire inversé (normalisations comprises) est mis en cache
+        sous forme de pickle dans PATHS['cache'] : tant que le JSON source
+        n'a pas changé, le démarrage évite de re-normaliser chaque variation.
         """
+        try:
+            src_mtime = self.corrections_path.stat().st_mtime_ns
+        except OSError:
+            src_mtime = None
+
+        cache_path = PATHS['cache'] / 'corrector.pkl'
+        if src_mtime is not None and cache_path.exists():
+            try:
+                with open(cache_path, 'rb') as f:
+                    cached_mtime, correction_map = pickle.load(f)
+                if cached_mtime == src_mtime:
+                    logging.info(f"Dictionnaire de corrections chargé depuis le cache ({len(correction_map)} variations).")
+                    return correction_map
+            except (OSError, pickle.UnpicklingError, ValueError, EOFError):
+                pass  # Cache illisible : on reconstruit depuis le JSON
+
         correction_map = {}
         try:
             with open(self.corrections_path, 'r', encoding='utf-8') as f:
                 data = json.load(f)
-            
+
             # Construit le dictionnaire inversé
             for correct_word, variations in data.items():
                 for variation in variations:
                     # Normalise la variation pour la recherche
                     norm_variation = TextProcessor.normalize_text(variation)
                     correction_map[norm_variation] = correct_word
-            
+
             logging.info(f"Dictionnaire de corrections chargé avec {len(correction_map)} variations.")
+
+            try:
+                with open(cache_path, 'wb') as f:
+                    pickle.dump((src_mtime, correction_map), f, protocol=pickle.HIGHEST_PROTOCOL)
+            except OSError as e:
+                logging.warning(f"Impossible d'écrire le cache du correcteur : {e}")
             return correction_map
 
         except (FileNotFoundError, json.JSONDecodeError):
@@ -5,8 +5,14 @@
 Gestionnaire pour le dictionnaire technique BTP.
 Permet de charger, sauvegarder, et d'étendre les requêtes en utilisant des synonymes.
 """
+import atexit
 import json
-from typing import Dict, List, Set
+import os
+import pickle
+import threading
+from functools import lru_cache
+from itertools import islice
+from typing import Dict, Set, Tuple
 from collections import defaultdict
 import logging
 from pathlib import Path
@@ -20,27 +26,107 @@ class DictionaryManager:
     
     def __init__(self, dictionary_path: Path = PATHS['dictionary']):
         self.dictionary_path = dictionary_path
-        self.dictionary: Dict[str, List[str]] = {}
+        # Les listes de synonymes sont stockées en tuples immuables : les
+        # lookups de expand_query renvoient un objet partagé, jamais copié.
+        self.dictionary: Dict[str, Tuple[str, ...]] = {}
         self.reverse_index: Dict[str, Set[str]] = defaultdict(set)
+        # Sauvegardes différées : les ajouts rapprochés sont regroupés en
+        # une seule écriture disque (voir save_dictionary).
+        self._save_lock = threading.Lock()
+        self._save_timer: threading.Timer | None = None
+        # Le timer est un thread daemon : sans ce filet, un arrêt du
+        # processus pendant la fenêtre de 2 s perdrait la mutation
+        atexit.register(self._flush_pending_save)
         self.load_dictionary()
 
     def load_dictionary(self):
         """Charge le dictionnaire depuis un fichier JSON."""
         try:
             with open(self.dictionary_path, 'r', encoding='utf-8') as f:
-                self.dictionary = json.load(f)
+                self.dictionary = {term: tuple(synonyms) for term, synonyms in json.load(f).items()}
             logging.info(f"Dictionnaire chargé depuis {self.dictionary_path} avec {len(self.dictionary)} entrées.")
         except (FileNotFoundError, json.JSONDecodeError) as e:
             logging.warning(f"Fichier dictionnaire non trouvé ou invalide ({e}). Utilisation d'un dictionnaire vide.")
             self.dictionary = {}
-        self._build_reverse_index()
+        if not self._load_cached_reverse_index():
+            self._build_reverse_index()
+            self._save_reverse_index_cache()
+        DictionaryManager.expand_query.cache_clear()
+
+    def _index_cache_path(self) -> Path:
+        return PATHS['cache'] / 'dictionary_index.pkl'
+
+    def _source_mtime(self) -> int | None:
+        try:
+            return self.dictionary_path.stat().st_mtime_ns
+        except OSError:
+            return None
+
+    def _load_cached_reverse_index(self) -> bool:
+        """Recharge l'index inversé depuis le cache pickle s'il est à jour."""
+        src_mtime = self._source_mtime()
+        cache_path = self._index_cache_path()
+        if src_mtime is None or not cache_path.exists():
+            return False
+        try:
+            with open(cache_path, 'rb') as f:
+                cached_mtime, reverse_index = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, ValueError, EOFError):
+            return False
+        if cached_mtime != src_mtime:
+            return False
+        self.reverse_index = defaultdict(set, reverse_index)
+        logging.info(f"Index inversé du dictionnaire chargé depuis le cache ({len(self.reverse_index)} clés).")
+        return True
+
+    def _save_reverse_index_cache(self):
+        """Sérialise l'index inversé pour éviter la re-normalisation au prochain démarrage."""
+        try:
+            with open(self._index_cache_path(), 'wb') as f:
+                pickle.dump((self._source_mtime(), dict(self.reverse_index)), f,
+                            protocol=pickle.HIGHEST_PROTOCOL)
+        except OSError as e:
+            logging.warning(f"Impossible d'écrire le cache de l'index inversé : {e}")
 
     def save_dictionary(self):
-        """Sauvegarde le dictionnaire dans un fichier JSON."""
+        """Programme une sauvegarde différée du dictionnaire (écritures regroupées).
+
+        Les ajouts de synonymes arrivent souvent en rafale ; un timer de 2 s
+        coalesce les écritures au lieu de sérialiser tout le JSON à chaque
+        mutation.
+        """
+        with self._save_lock:
+            if self._save_timer is not None:
+                self._save_timer.cancel()
+            self._save_timer = threading.Timer(2.0, self._save_dictionary_now)
+            self._save_timer.daemon = True
+            self._save_timer.start()
+
+    def _flush_pending_save(self):
+        """Exécute immédiatement une sauvegarde différée encore en attente.
+
+        Appelée via atexit : un recyclage de worker ou un SIGTERM de
+        déploiement survenant avant l'expiration du timer n'avale plus
+        l'écriture (au pire, elle est faite deux fois — atomique).
+        """
+        with self._save_lock:
+            timer = self._save_timer
+            self._save_timer = None
+        if timer is not None and timer.is_alive():
+            timer.cancel()
+            self._save_dictionary_now()
+
+    def _save_dictionary_now(self):
+        """Écrit le dictionnaire sur disque de façon atomique (temp + os.replace)."""
         try:
-            with open(self.dictionary_path, 'w', encoding='utf-8') as f:
-                json.dump(self.dictionary, f, ensure_ascii=False, indent=4)
+            tmp_path = self.dictionary_path.with_name(self.dictionary_path.name + '.tmp')
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({term: list(synonyms) for term, synonyms in self.dictionary.items()},
+                          f, ensure_ascii=False, indent=4)
+            os.replace(tmp_path, self.dictionary_path)
             logging.info(f"Dictionnaire sauvegardé dans {self.dictionary_path}.")
+            # Le mtime du JSON vient de changer : réaligne le cache de l'index
+            self._save_reverse_index_cache()
         except IOError as e:
             logging.error(f"Erreur lors de la sauvegarde du dictionnaire : {e}")
 
@@ -55,8 +141,14 @@ class DictionaryManager:
                 self.reverse_index[normalized_synonym].add(normalized_main_term)
         logging.info(f"Index inversé du dictionnaire construit avec {len(self.reverse_index)} clés.")
 
-    def expand_query(self, query: str, max_expansions: int = 10) -> List[str]:
-        """Étend une requête en y ajoutant des synonymes pertinents trouvés dans le dictionnaire."""
+    @lru_cache(maxsize=4096)
+    def expand_query(self, query: str, max_expansions: int = 10) -> Tuple[str, ...]:
+        """Étend une requête en y ajoutant des synonymes pertinents trouvés dans le dictionnaire.
+
+        Mémoïsée (les mêmes requêtes reviennent en boucle via
+        l'autocomplétion) ; le cache est purgé à chaque mutation du
+        dictionnaire. Retourne un tuple immuable.
+        """
         normalized_query = TextProcessor.normalize_text(query)
         query_tokens = set(TextProcessor.tokenize_btp(normalized_query, preserve_technical=False))
         
@@ -71,23 +163,30 @@ class DictionaryManager:
 
         # Ajoute les termes originaux de la requête
         expanded_terms.update(query_tokens)
-        
-        # Limite le nombre de termes pour éviter une requête trop large
-        return list(expanded_terms)[:max_expansions]
+
+        # Limite le nombre de termes pour éviter une requête trop large,
+        # sans matérialiser l'ensemble complet en liste intermédiaire
+        return tuple(islice(expanded_terms, max_expansions))
 
     def add_synonym(self, main_term: str, new_synonym: str):
         """Ajoute un nouveau synonyme à un terme existant ou crée une nouvelle entrée."""
         main_term_key = main_term.lower()
         
         # Si le terme principal n'existe pas, on le crée
+        normalized_main_term = TextProcessor.normalize_text(main_term_key)
         if main_term_key not in self.dictionary:
-            self.dictionary[main_term_key] = [main_term]
-        
+            self.dictionary[main_term_key] = (main_term,)
+            self.reverse_index[TextProcessor.normalize_text(main_term)].add(normalized_main_term)
+
         # Ajoute le nouveau synonyme s'il n'est pas déjà présent
         if new_synonym.lower() not in [s.lower() for s in self.dictionary[main_term_key]]:
-            self.dictionary[main_term_key].append(new_synonym)
+            self.dictionary[main_term_key] = self.dictionary[main_term_key] + (new_synonym,)
             logging.info(f"Ajout du synonyme '{new_synonym}' pour le terme '{main_term_key}'.")
-            self._build_reverse_index()
+            # Mise à jour incrémentale : inutile de re-normaliser tout le
+            # dictionnaire pour l'insertion d'une seule clé.
+            self.reverse_index[TextProcessor.normalize_text(new_synonym)].add(normalized_main_term)
+            # Les expansions mémoïsées peuvent référencer l'ancienne entrée
+            DictionaryManager.expand_query.cache_clear()
             self.save_dictionary()
         else:
             logging.info(f"Le synonyme '{new_synonym}' existe déjà pour '{main_term_key}'.")
@@ -1,12 +1,25 @@
+import numpy as np
 import pandas as pd
+try:
+    # Parseur CSV C++ multi-thread, nettement plus rapide que pandas sur
+    # les gros catalogues ; dépendance optionnelle, repli pandas sinon.
+    import pyarrow.csv as pacsv
+except ImportError:
+    pacsv = None
 from flask import Flask, request, jsonify
 from flask_cors import CORS
-from sentence_transformers import SentenceTransformer, util
+from sentence_transformers import SentenceTransformer
 import torch
 import re
 import json
 import os
 import glob
+import hashlib
+import heapq
+import pickle
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 
 # --- Initialisation ---
 app = Flask(__name__)
@@ -14,10 +27,26 @@ CORS(app)
 
 app.config['JSON_AS_ASCII'] = False
 
-app.config['JSONIFY_PRETTYPRINT_REGULAR'] = True
+# JSON compact : l'indentation gonflait d'environ un tiers les réponses
+# /hierarchy et /search, pour un client Excel qui ne les affiche jamais
+app.config['JSONIFY_PRETTYPRINT_REGULAR'] = False
 
 print("Chargement du modèle d'IA...")
 model = SentenceTransformer('all-MiniLM-L6-v2')
+if torch.cuda.is_available():
+    # FP16 sur GPU : double le débit d'encodage
+    model = model.half()
+else:
+    # Quantification dynamique int8 des couches linéaires : les GEMM du
+    # transformer passent par les noyaux entiers du CPU (VNNI), ce qui
+    # accélère nettement model.encode sans changer l'API.
+    try:
+        model[0].auto_model = torch.ao.quantization.quantize_dynamic(
+            model[0].auto_model, {torch.nn.Linear}, dtype=torch.qint8
+        )
+        print("Modèle quantifié en int8 (inférence CPU).")
+    except Exception as e:
+        print(f"Quantification int8 indisponible, modèle FP32 conservé : {e}")
 print("Modèle chargé.")
 
 # --- Dictionnaire des termes techniques BTP ---
@@ -92,6 +121,7 @@ def load_dictionary():
             save_dictionary()
     except Exception as e:
         print(f"Erreur chargement dictionnaire technique : {e}")
+    _rebuild_synonym_lookup()
 
 def save_dictionary():
     """Sauvegarde le dictionnaire technique."""
@@ -140,19 +170,68 @@ def identify_entry_type(designation, code):
     return "content"
 
 def build_hierarchical_structure(df):
-    """Construit une structure hiérarchique à partir du DataFrame."""
+    """Construit une structure hiérarchique à partir du DataFrame.
+
+    Retourne (structure, content_arrays) : les listes "content" de la
+    structure ne contiennent plus des dicts par article mais des positions
+    entières dans content_arrays, un bloc de colonnes NumPy contiguës
+    (struct-of-arrays). Le scoring se fait alors par masques vectorisés
+    plutôt que par accès dict ligne à ligne.
+    """
     structure = {}
-    
-    for idx, row in df.iterrows():
-        code = str(row.get('Code', ''))
-        designation = str(row.get('Désignation', ''))
-        
-        hierarchy = parse_code_hierarchy(code)
-        if not hierarchy:
+
+    # Colonnes extraites une fois en tableaux NumPy : itérer des objets
+    # Python bruts est 5-10x plus rapide que iterrows, qui construit une
+    # Series par ligne.
+    indices = df.index.to_numpy()
+    codes_series = df['Code'].astype(str)
+    codes = codes_series.to_numpy()
+    designations = df['Désignation'].astype(str).to_numpy()
+    unites = df['Unité'].to_numpy()
+    minimums = df['Minimum'].to_numpy()
+    moyens = df['Moyen'].to_numpy()
+    maximums = df['Maximum'].to_numpy()
+
+    # Découpage vectorisé des codes hiérarchiques : une seule passe
+    # pandas/NumPy remplace les appels par ligne à parse_code_hierarchy
+    # et identify_entry_type.
+    parts = codes_series.str.split('.', expand=True).reindex(columns=range(6)).fillna('')
+    n_parts = codes_series.str.count(r'\.').to_numpy() + 1
+    mains = parts[0].to_numpy()
+    titles = parts[1].to_numpy()
+    subtitles_arr = parts[2].to_numpy()
+    subsubtitles = parts[3].to_numpy()
+    items = parts[4].to_numpy()
+    details = parts[5].to_numpy()
+
+    valid = n_parts >= 3
+    is_title = valid & (n_parts == 3) & np.isin(subtitles_arr, ('0', ''))
+    is_subtitle = valid & (n_parts == 4) & np.isin(subsubtitles, ('0', ''))
+
+    for pos in range(len(indices)):
+        if not valid[pos]:
             continue
-        
-        entry_type = identify_entry_type(designation, code)
-        
+        idx = indices[pos]
+        code = codes[pos]
+        designation = designations[pos]
+
+        hierarchy = {
+            "main": mains[pos],
+            "title": titles[pos],
+            "subtitle": subtitles_arr[pos],
+            "subsubtitle": subsubtitles[pos],
+            "item": items[pos],
+            "detail": details[pos]
+        }
+
+        if is_title[pos]:
+            entry_type = "title"
+        elif is_subtitle[pos]:
+            entry_type = "subtitle"
+        else:
+            entry_type = "content"
+
+
         # Clé pour le titre principal
         title_key = f"{hierarchy['main']}.{hierarchy['title']}.{hierarchy['subtitle']}"
         
@@ -163,89 +242,107 @@ def build_hierarchical_structure(df):
         if title_key not in structure:
             structure[title_key] = {
                 "title": "",
+                "title_upper": "",
                 "title_index": None,
                 "subtitles": {},
                 "content": []
             }
-        
+
         if entry_type == "title":
             structure[title_key]["title"] = designation
+            # Majuscules pré-calculées : évite un .upper() par titre à chaque requête
+            structure[title_key]["title_upper"] = designation.upper()
             structure[title_key]["title_index"] = idx
-            
+
         elif entry_type == "subtitle":
             if subtitle_key not in structure[title_key]["subtitles"]:
                 structure[title_key]["subtitles"][subtitle_key] = {
                     "subtitle": designation,
+                    "subtitle_upper": designation.upper(),
                     "subtitle_index": idx,
                     "content": []
                 }
             else:
                 structure[title_key]["subtitles"][subtitle_key]["subtitle"] = designation
+                structure[title_key]["subtitles"][subtitle_key]["subtitle_upper"] = designation.upper()
                 structure[title_key]["subtitles"][subtitle_key]["subtitle_index"] = idx
                 
         elif entry_type == "content":
-            content_item = {
-                "index": idx,
-                "code": code,
-                "designation": designation,
-                "unite": row.get('Unité', ''),
-                "minimum": row.get('Minimum', ''),
-                "moyen": row.get('Moyen', ''),
-                "maximum": row.get('Maximum', ''),
-                "hierarchy": hierarchy
-            }
-            
             # Si c'est associé à un sous-titre
             if hierarchy['subsubtitle'] and subtitle_key in structure[title_key]["subtitles"]:
-                structure[title_key]["subtitles"][subtitle_key]["content"].append(content_item)
+                structure[title_key]["subtitles"][subtitle_key]["content"].append(pos)
             else:
                 # Sinon, l'associer directement au titre
-                structure[title_key]["content"].append(content_item)
-    
-    return structure
+                structure[title_key]["content"].append(pos)
+
+    content_arrays = {
+        'indices': indices,
+        'codes': codes,
+        'designations': designations,
+        'designations_lower': np.char.lower(designations.astype('U')),
+        'unites': unites,
+        'minimum': minimums,
+        'moyen': moyens,
+        'maximum': maximums,
+    }
+    return structure, content_arrays
+
+def build_title_match_index(hierarchical_data):
+    """Pré-calcule les titres du CSV correspondant à chaque entrée du
+    dictionnaire titres/sous-titres.
+
+    Le balayage titres x patterns (O(T·P) par requête auparavant) est fait
+    une seule fois au chargement du CSV ; au moment de la requête, la
+    correspondance par patterns devient un accès dictionnaire O(1).
+    """
+    index = {}
+    for excel_title_upper, title_config in TITLE_SUBTITLE_DICTIONARY.items():
+        patterns = [p.upper() for p in title_config.get("patterns", [])]
+        matches = []
+        for title_key, title_data in hierarchical_data.items():
+            csv_title = title_data.get("title_upper", "")
+            if any(pattern in csv_title for pattern in patterns):
+                matches.append(title_key)
+        index[excel_title_upper.upper()] = matches
+    return index
+
+def find_matching_titles_in_csv(excel_titles, csv_data):
+    """Trouve les titres du CSV qui correspondent aux titres Excel sélectionnés.
+
+    Dédoublonné par title_key ; la correspondance partielle par mots ne
+    sert que de repli quand le dictionnaire n'a rien donné (même logique
+    que find_matching_subtitles_in_csv), au lieu de rebalayer tous les
+    titres à chaque requête et de produire des doublons.
+    """
+    hierarchical_data = csv_data['hierarchical_data']
+    title_match_index = csv_data.get('title_match_index', {})
+    matching_titles = {}
 
-def find_matching_titles_in_csv(excel_titles, hierarchical_data):
-    """Trouve les titres du CSV qui correspondent aux titres Excel sélectionnés."""
-    matching_titles = []
-    
     for excel_title in excel_titles:
         excel_title_upper = excel_title.upper()
-        
-        # Recherche directe dans le dictionnaire de correspondances
-        if excel_title_upper in TITLE_SUBTITLE_DICTIONARY:
-            title_config = TITLE_SUBTITLE_DICTIONARY[excel_title_upper]
-            patterns = title_config.get("patterns", [])
-            
-            # Cherche dans les titres du CSV
+
+        # Correspondance par patterns, pré-calculée au chargement du CSV
+        for title_key in title_match_index.get(excel_title_upper, ()):
+            matching_titles.setdefault(title_key, {
+                "title_key": title_key,
+                "title_data": hierarchical_data[title_key],
+                "excel_title": excel_title
+            })
+
+    # Repli : correspondance partielle directe par mots
+    if not matching_titles:
+        for excel_title in excel_titles:
+            excel_words = [w for w in excel_title.upper().split() if len(w) > 3]
             for title_key, title_data in hierarchical_data.items():
-                csv_title = title_data.get("title", "").upper()
-                
-                # Correspondance par patterns
-                for pattern in patterns:
-                    if pattern.upper() in csv_title:
-                        matching_titles.append({
-                            "title_key": title_key,
-                            "title_data": title_data,
-                            "excel_title": excel_title
-                        })
-                        break
-        
-        # Recherche par correspondance partielle directe
-        for title_key, title_data in hierarchical_data.items():
-            csv_title = title_data.get("title", "").upper()
-            
-            # Correspondance partielle
-            excel_words = excel_title_upper.split()
-            for word in excel_words:
-                if len(word) > 3 and word in csv_title:
-                    matching_titles.append({
+                csv_title = title_data.get("title_upper", "")
+                if any(word in csv_title for word in excel_words):
+                    matching_titles.setdefault(title_key, {
                         "title_key": title_key,
                         "title_data": title_data,
                         "excel_title": excel_title
                     })
-                    break
-    
-    return matching_titles
+
+    return list(matching_titles.values())
 
 def find_matching_subtitles_in_csv(excel_subtitle, excel_titles, hierarchical_data):
     """Trouve les sous-titres du CSV qui correspondent au sous-titre Excel."""
@@ -271,7 +368,7 @@ def find_matching_subtitles_in_csv(excel_subtitle, excel_titles, hierarchical_da
                     # Cherche ces sous-titres dans la structure hiérarchique
                     for title_key, title_data in hierarchical_data.items():
                         for subtitle_full_key, subtitle_data in title_data["subtitles"].items():
-                            csv_subtitle = subtitle_data.get("subtitle", "").upper()
+                            csv_subtitle = subtitle_data.get("subtitle_upper", "")
                             
                             for target_subtitle in csv_subtitles:
                                 if target_subtitle.upper() in csv_subtitle:
@@ -286,7 +383,7 @@ def find_matching_subtitles_in_csv(excel_subtitle, excel_titles, hierarchical_da
     if not matching_subtitles:
         for title_key, title_data in hierarchical_data.items():
             for subtitle_key, subtitle_data in title_data["subtitles"].items():
-                csv_subtitle = subtitle_data.get("subtitle", "").upper()
+                csv_subtitle = subtitle_data.get("subtitle_upper", "")
                 
                 # Correspondance par mots-clés
                 excel_words = excel_subtitle_upper.split()
@@ -301,18 +398,82 @@ def find_matching_subtitles_in_csv(excel_subtitle, excel_titles, hierarchical_da
     
     return matching_subtitles
 
-def load_csv_file(filename):
-    """Charge un fichier CSV spécifique."""
+def _csv_cache_paths(filename, file_path):
+    """Chemins du cache disque d'un CSV, clés par sha256 de son contenu.
+
+    Changer le CSV change la clé : les caches périmés sont simplement
+    ignorés, pas besoin d'invalidation explicite.
+    """
+    with open(file_path, 'rb') as f:
+        key = hashlib.sha256(f.read()).hexdigest()[:16]
+    cache_dir = os.path.join('BIBLIOTHEQUE', '.cache')
+    os.makedirs(cache_dir, exist_ok=True)
+    # v2 : prix stockés en float32 (les caches v1 contenaient des chaînes)
+    base = os.path.join(cache_dir, f"{filename}.{key}.v2")
+    return base + '.pkl', base + '.npy'
+
+def _write_csv_cache(filename, file_path, csv_data):
+    """Écriture atomique du cache disque d'un CSV (fichier temporaire puis
+    os.replace) : un démarrage interrompu ne laisse jamais de cache corrompu."""
+    try:
+        pkl_path, npy_path = _csv_cache_paths(filename, file_path)
+        # fp16 sur disque : matrice normalisée, la demi-précision divise
+        # par deux la taille du cache sans effet mesurable sur un
+        # classement par cosinus
+        np.save(npy_path + '.tmp.npy', csv_data['embeddings_matrix'].cpu().numpy().astype(np.float16))
+        os.replace(npy_path + '.tmp.npy', npy_path)
+        to_pickle = {k: v for k, v in csv_data.items()
+                     if k not in ('embeddings_matrix', 'title_match_index')}
+        with open(pkl_path + '.tmp', 'wb') as f:
+            pickle.dump(to_pickle, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(pkl_path + '.tmp', pkl_path)
+    except OSError as e:
+        print(f"Cache disque non écrit pour {filename}: {e}")
+
+def load_csv_file(filename, defer_encoding=False):
+    """Charge un fichier CSV spécifique (depuis le cache disque si possible).
+
+    L'encodage des désignations domine le temps de démarrage ; le cache
+    disque ramène le chargement d'un catalogue inchangé à une lecture de
+    fichiers. Avec `defer_encoding=True`, l'encodage (et l'écriture du
+    cache) est laissé à warmup_embeddings(), qui regroupe tous les CSV en
+    un seul lot.
+    """
     file_path = os.path.join('BIBLIOTHEQUE', filename + '.csv')
-    
+
     if not os.path.exists(file_path):
         print(f"ERREUR: Fichier '{file_path}' introuvable.")
         return None
-    
+
     try:
-        column_names = ['Code', 'Désignation', 'Unité', 'Minimum', 'Moyen', 'Maximum', 'Extra']
-        
-        df = pd.read_csv(file_path, encoding='utf-8', sep=';', skiprows=4, names=column_names)
+        pkl_path, npy_path = _csv_cache_paths(filename, file_path)
+        if os.path.exists(pkl_path) and os.path.exists(npy_path):
+            with open(pkl_path, 'rb') as f:
+                csv_data = pickle.load(f)
+            emb = torch.from_numpy(np.ascontiguousarray(np.load(npy_path))).to(model.device)
+            # fp16 sur disque ; en mémoire le dtype suit le device (fp16 sur
+            # CUDA, fp32 sur CPU où les noyaux half sont lents)
+            csv_data['embeddings_matrix'] = emb.half() if emb.is_cuda else emb.float()
+            # Le dictionnaire titres/sous-titres peut changer entre deux
+            # démarrages : son index est recalculé, jamais mis en cache
+            csv_data['title_match_index'] = build_title_match_index(csv_data['hierarchical_data'])
+            print(f"Fichier {filename} restauré depuis le cache disque ({len(csv_data['df_hierarchical'])} articles)")
+            return csv_data
+
+        # Les CSV des mercuriales ont 6 champs par ligne : déclarer une
+        # colonne de trop ferait rejeter chaque ligne par pyarrow (mauvais
+        # nombre de colonnes -> invalid_row_handler -> catalogue vide)
+        column_names = ['Code', 'Désignation', 'Unité', 'Minimum', 'Moyen', 'Maximum']
+
+        if pacsv is not None:
+            table = pacsv.read_csv(
+                file_path,
+                read_options=pacsv.ReadOptions(skip_rows=4, column_names=column_names, encoding='utf8'),
+                parse_options=pacsv.ParseOptions(delimiter=';', invalid_row_handler=lambda row: 'skip'),
+            )
+            df = table.to_pandas()
+        else:
+            df = pd.read_csv(file_path, encoding='utf-8', sep=';', skiprows=4, names=column_names)
         df_hierarchical = df[['Code', 'Désignation', 'Unité', 'Minimum', 'Moyen', 'Maximum']].copy()
         df_hierarchical.dropna(subset=['Désignation'], inplace=True)
         
@@ -321,9 +482,15 @@ def load_csv_file(filename):
         df_hierarchical['Désignation'] = df_hierarchical['Désignation'].astype(str).str.strip()
         df_hierarchical['Unité'] = df_hierarchical['Unité'].astype(str).str.strip()
         
-        # Nettoyage des prix
+        # Nettoyage des prix, vectorisé : une passe C de suppression des
+        # espaces + une conversion numérique, au lieu de N appels Python.
+        # Les prix restent numériques (NaN si absent/invalide) ; le
+        # formatage d'affichage est différé à l'émission du JSON.
         for price_col in ['Minimum', 'Moyen', 'Maximum']:
-            df_hierarchical[price_col] = df_hierarchical[price_col].apply(clean_price)
+            df_hierarchical[price_col] = pd.to_numeric(
+                df_hierarchical[price_col].astype(str).str.replace(' ', '', regex=False),
+                errors='coerce'
+            ).astype('float32')
         
         # Suppression des doublons
         df_hierarchical.drop_duplicates(subset=['Désignation', 'Unité'], inplace=True)
@@ -332,20 +499,60 @@ def load_csv_file(filename):
         print(f"Fichier {filename} chargé : {len(df_hierarchical)} articles")
         
         # Construction de la structure hiérarchique
-        hierarchical_data = build_hierarchical_structure(df_hierarchical)
+        hierarchical_data, content_arrays = build_hierarchical_structure(df_hierarchical)
         
         # Préparation pour la recherche classique
         df_search = df_hierarchical[['Désignation', 'Unité', 'Minimum', 'Moyen', 'Maximum']].copy()
         df_search['search_text'] = df_search['Désignation'].apply(lambda x: preprocess_text(x, for_similarity=True))
         df_search = df_search[df_search['search_text'].str.len() > 0]
-        df_search['embeddings'] = df_search['search_text'].apply(lambda x: model.encode(x))
-        
-        return {
+
+        # Encodage en un seul appel batché : une matrice (N, D) normalisée et
+        # contiguë remplace N encodages unitaires stockés objet par objet
+        # dans une colonne pandas.
+        # inference_mode coupe l'autograd (pas de graphe ni de version
+        # counters) : encode purement en avant, légèrement plus rapide et
+        # moins gourmand en mémoire. L'attention passe déjà par les noyaux
+        # fusionnés SDPA de PyTorch 2.x.
+        texts = df_search['search_text'].tolist()
+        if defer_encoding:
+            # Encodage regroupé sur tous les CSV par warmup_embeddings()
+            embeddings_matrix = None
+        else:
+            with torch.inference_mode():
+                embeddings_matrix = model.encode(
+                    texts,
+                    batch_size=64,
+                    convert_to_tensor=True,
+                    normalize_embeddings=True,
+                    show_progress_bar=False,
+                )
+            # Garantit un bloc (N, D) contigu : torch.mv sur la matrice entière
+            # descend alors dans un seul appel BLAS sans copie préalable
+            embeddings_matrix = embeddings_matrix.contiguous()
+
+        csv_data = {
             'df_hierarchical': df_hierarchical,
             'hierarchical_data': hierarchical_data,
-            'df_search': df_search
+            'title_match_index': build_title_match_index(hierarchical_data),
+            'content_arrays': content_arrays,
+            'df_search': df_search,
+            'search_designations_lower': np.char.lower(
+                df_search['Désignation'].astype(str).to_numpy().astype('U')
+            ),
+            'inverted_index': build_inverted_index(df_search),
+            'embeddings_matrix': embeddings_matrix,
+            'row_index': df_search.index.to_numpy(),
         }
-        
+
+        if defer_encoding:
+            # Les textes en attente sont consommés (et le cache écrit) par
+            # warmup_embeddings() une fois tous les fichiers chargés
+            csv_data['_pending_texts'] = texts
+        else:
+            _write_csv_cache(filename, file_path, csv_data)
+
+        return csv_data
+
     except Exception as e:
         print(f"ERREUR lors du chargement de {filename}: {e}")
         return None
@@ -359,53 +566,154 @@ def load_all_csv_files():
         return
     
     csv_files = glob.glob('BIBLIOTHEQUE/*.csv')
-    
-    for file_path in csv_files:
-        filename = os.path.splitext(os.path.basename(file_path))[0]
-        print(f"Chargement de {filename}...")
-        
-        csv_data = load_csv_file(filename)
-        if csv_data:
-            loaded_csvs[filename] = csv_data
-    
+    filenames = [os.path.splitext(os.path.basename(p))[0] for p in csv_files]
+
+    if filenames:
+        # Chargement en parallèle : le parsing CSV et le nettoyage pandas
+        # relâchent le GIL, donc les fichiers se chargent quasi linéairement
+        # avec le nombre de cœurs.
+        with ThreadPoolExecutor(max_workers=min(len(filenames), os.cpu_count() or 1)) as executor:
+            for filename, csv_data in zip(
+                    filenames,
+                    executor.map(lambda f: load_csv_file(f, defer_encoding=True), filenames)):
+                if csv_data:
+                    loaded_csvs[filename] = csv_data
+
+    # Les CSV absents du cache disque sont encodés maintenant, tous ensemble
+    warmup_embeddings()
+
     print(f"Total fichiers CSV chargés : {len(loaded_csvs)}")
 
+def warmup_embeddings():
+    """Encode en un seul lot les désignations de tous les CSV en attente.
+
+    Concaténer les textes de tous les fichiers avant l'appel au modèle
+    maintient des batchs pleins d'un bout à l'autre (pas de fin de lot
+    creuse par fichier, pas d'aller-retour Python entre deux CSV) ; la
+    matrice globale est ensuite redécoupée par longueurs cumulées.
+    """
+    pending = [(filename, csv_data) for filename, csv_data in loaded_csvs.items()
+               if csv_data.get('_pending_texts') is not None]
+    if not pending:
+        return
+
+    all_texts = []
+    for _, csv_data in pending:
+        all_texts.extend(csv_data['_pending_texts'])
+    print(f"Encodage groupé de {len(all_texts)} désignations ({len(pending)} fichier(s))...")
+
+    with torch.inference_mode():
+        all_embeddings = model.encode(
+            all_texts,
+            batch_size=256,
+            convert_to_tensor=True,
+            normalize_embeddings=True,
+            show_progress_bar=False,
+        )
+
+    start = 0
+    for filename, csv_data in pending:
+        count = len(csv_data.pop('_pending_texts'))
+        # .contiguous() : chaque tranche redevient un bloc (N, D) autonome
+        csv_data['embeddings_matrix'] = all_embeddings[start:start + count].contiguous()
+        start += count
+        _write_csv_cache(filename, os.path.join('BIBLIOTHEQUE', filename + '.csv'), csv_data)
+
+# Synonymes en minuscules pré-calculés : le .lower() par synonyme et par
+# requête est fait une seule fois au chargement du dictionnaire
+_LOWER_SYNONYMS = []
+
+def _rebuild_synonym_lookup():
+    """Reconstruit _LOWER_SYNONYMS et invalide le cache d'expansion."""
+    global _LOWER_SYNONYMS
+    _LOWER_SYNONYMS = [
+        (tuple(synonyms), [s.lower() for s in synonyms])
+        for synonyms in TECHNICAL_DICTIONARY.values()
+    ]
+    expand_query.cache_clear()
+
+@lru_cache(maxsize=2048)
 def expand_query(query):
-    """Élargit la requête avec des synonymes techniques."""
+    """Élargit la requête avec des synonymes techniques.
+
+    Mémoïsée : l'autocomplétion renvoie les mêmes requêtes en boucle.
+    Retourne un tuple (immuable, donc partageable entre les hits de cache).
+    """
     expanded_terms = set()
     query_lower = query.lower()
-    
-    for main_term, synonyms in TECHNICAL_DICTIONARY.items():
+
+    for synonyms, lower_synonyms in _LOWER_SYNONYMS:
         for word in query_lower.split():
             word_clean = re.sub(r'[^\w]', '', word)
             if len(word_clean) < 3:
                 continue
-                
-            if word_clean in [s.lower() for s in synonyms]:
+
+            if word_clean in lower_synonyms:
                 expanded_terms.update(synonyms)
-            elif any(word_clean in s.lower() or s.lower() in word_clean for s in synonyms):
+            elif any(word_clean in s or s in word_clean for s in lower_synonyms):
                 expanded_terms.update(synonyms)
-    
+
     original_words = [word for word in query_lower.split() if len(word) > 2]
     expanded_terms.update(original_words)
-    
-    return list(expanded_terms)
+
+    return tuple(expanded_terms)
+
+def build_inverted_index(df_search):
+    """Index inversé mot -> positions des lignes dans df_search.
+
+    Construit une fois au chargement, il évite à search_global de balayer
+    les 10k+ désignations du catalogue à chaque requête : seules les
+    lignes candidates (au moins un terme présent) sont scorées.
+    """
+    index = defaultdict(set)
+    for pos, designation in enumerate(df_search['Désignation'].to_numpy()):
+        for word in str(designation).lower().split():
+            index[word].add(pos)
+    return dict(index)
+
+def find_candidate_positions(inverted_index, terms, designations_lower):
+    """Positions des lignes dont la désignation contient l'un des termes.
+
+    Pour un terme sans espace, `term in designation_lower` équivaut à
+    `term in word` pour au moins un mot de la désignation : le balayage
+    se fait sur le vocabulaire (quelques milliers de mots uniques) et non
+    sur les lignes. Les synonymes multi-mots du dictionnaire ("remblai en
+    place", "apport de terre", ...) sont invisibles dans un index mot à
+    mot : ils repassent par une recherche vectorisée sur les désignations
+    complètes, unie aux candidats de l'index.
+    """
+    simple_terms = [term for term in terms if ' ' not in term]
+    multi_terms = [term for term in terms if ' ' in term]
+    candidates = set()
+    if simple_terms:
+        for word, postings in inverted_index.items():
+            if any(term in word for term in simple_terms):
+                candidates |= postings
+    for term in multi_terms:
+        candidates.update(np.flatnonzero(np.char.find(designations_lower, term) >= 0).tolist())
+    return candidates
+
+@lru_cache(maxsize=4096)
+def _word_boundary_pattern(term):
+    """Motif \\bterme\\b compilé et mémoïsé : évite une recompilation par
+    terme et par candidat dans les boucles de scoring."""
+    return re.compile(r'\b' + re.escape(term) + r'\b')
 
 def calculate_relevance_score(designation, query_terms, expanded_terms):
     """Calcule un score de pertinence basé sur plusieurs critères."""
     designation_lower = designation.lower()
     score = 0
-    
+
     for term in query_terms:
         if term in designation_lower:
             score += 10
-            if re.search(r'\b' + re.escape(term) + r'\b', designation_lower):
+            if _word_boundary_pattern(term).search(designation_lower):
                 score += 5
-    
+
     for term in expanded_terms:
         if term in designation_lower:
             score += 3
-            if re.search(r'\b' + re.escape(term) + r'\b', designation_lower):
+            if _word_boundary_pattern(term).search(designation_lower):
                 score += 2
 
     if len(query_terms) > 1:
@@ -418,39 +726,77 @@ def calculate_relevance_score(designation, query_terms, expanded_terms):
     
     if any(designation_lower.startswith(term) for term in query_terms + expanded_terms):
         score += 3
-    
+
     return score
 
+def calculate_relevance_scores(designations_lower, query_terms, expanded_terms):
+    """Version vectorisée de calculate_relevance_score sur un lot de lignes.
+
+    Les présences de sous-chaînes sont calculées en une passe C par terme
+    (np.char.find) ; le bonus "mot entier" (regex) n'est évalué que sur
+    les lignes où le terme est déjà présent. Mêmes barèmes et résultats
+    que la version scalaire.
+    """
+    n = len(designations_lower)
+    scores = np.zeros(n, dtype=np.float64)
+    all_original = np.ones(n, dtype=bool) if len(query_terms) > 1 else None
+
+    for terms, hit_pts, word_pts in ((query_terms, 10, 5), (expanded_terms, 3, 2)):
+        for term in terms:
+            mask = np.char.find(designations_lower, term) >= 0
+            scores[mask] += hit_pts
+            pattern = _word_boundary_pattern(term)
+            for pos in np.flatnonzero(mask):
+                if pattern.search(designations_lower[pos]):
+                    scores[pos] += word_pts
+            if terms is query_terms and all_original is not None:
+                all_original &= mask
+
+    if all_original is not None:
+        scores[all_original] += 20
+
+    scores[np.char.str_len(designations_lower) > 100] -= 1
+
+    starts = np.zeros(n, dtype=bool)
+    for term in query_terms + expanded_terms:
+        starts |= np.char.startswith(designations_lower, term)
+    scores[starts] += 3
+
+    return scores
+
+# Table de translittération des accents : une seule passe C via
+# str.translate, au lieu de 16 str.replace successifs (une allocation de
+# chaîne par accent)
+_ACCENTS_TABLE = str.maketrans({
+    'é': 'e', 'è': 'e', 'ê': 'e', 'ë': 'e',
+    'à': 'a', 'â': 'a', 'ä': 'a',
+    'ù': 'u', 'û': 'u', 'ü': 'u',
+    'ô': 'o', 'ö': 'o',
+    'ç': 'c',
+    'î': 'i', 'ï': 'i'
+})
+
+# Abréviations BTP : motifs compilés une seule fois à l'import, au lieu
+# d'une recompilation par abréviation à chaque appel de preprocess_text
+_ABBREV_PATTERNS = [
+    (re.compile(r'\ballu\b'), 'aluminium'),
+    (re.compile(r'\balu\b'), 'aluminium'),
+    (re.compile(r'\bgalva\b'), 'galvanise'),
+    (re.compile(r'\bmetal\b'), 'metallique'),
+    (re.compile(r'\bm2\b'), 'metre carre'),
+    (re.compile(r'\bm3\b'), 'metre cube'),
+]
+
 def preprocess_text(text, for_similarity=False):
     """Nettoie et standardise le texte."""
     if not isinstance(text, str):
         return ""
     
-    text = text.lower()
-    
-    accents = {
-        'é': 'e', 'è': 'e', 'ê': 'e', 'ë': 'e',
-        'à': 'a', 'â': 'a', 'ä': 'a',
-        'ù': 'u', 'û': 'u', 'ü': 'u',
-        'ô': 'o', 'ö': 'o',
-        'ç': 'c',
-        'î': 'i', 'ï': 'i'
-    }
-    
-    for accent, letter in accents.items():
-        text = text.replace(accent, letter)
-    
-    abbreviations = {
-        r'\ballu\b': 'aluminium',
-        r'\balu\b': 'aluminium',
-        r'\bgalva\b': 'galvanise',
-        r'\bmetal\b': 'metallique',
-        r'\bm2\b': 'metre carre',
-        r'\bm3\b': 'metre cube'
-    }
-    
-    for abbrev, full in abbreviations.items():
-        text = re.sub(abbrev, full, text)
+    text = text.lower().translate(_ACCENTS_TABLE)
+
+
+    for abbrev_pattern, full in _ABBREV_PATTERNS:
+        text = abbrev_pattern.sub(full, text)
     
     if for_similarity:
         stop_words = {'de', 'la', 'le', 'et', 'en', 'un', 'une', 'avec', 'du', 'des', 'les', 'pour', 'sur', 'dans', 'par'}
@@ -460,27 +806,24 @@ def preprocess_text(text, for_similarity=False):
     
     return text
 
-def clean_price(price):
-    """Nettoie et formate les prix."""
-    if pd.isna(price):
+def _fmt_price(value):
+    """Formate un prix float en chaîne d'affichage ("12 345" ou "N/A").
+
+    Appelé uniquement sur les top-k émis dans le JSON, jamais sur toute
+    la colonne : les prix restent des float32 en interne.
+    """
+    if value is None or pd.isna(value):
         return "N/A"
-    
-    price_str = str(price).strip()
-    
-    try:
-        price_float = float(price_str.replace(' ', ''))
-        return f"{price_float:,.0f}".replace(',', ' ')
-    except:
-        return price_str
+    return f"{float(value):,.0f}".replace(',', ' ')
 
-def get_price_by_type(content_item, price_type):
-    """Retourne le prix selon le type demandé."""
+def get_price_by_type(content_arrays, positions, price_type):
+    """Retourne la colonne de prix demandée pour un lot de positions (gather NumPy)."""
     if price_type.upper() == "MINIMUM":
-        return content_item.get('minimum', 'N/A')
+        return content_arrays['minimum'][positions]
     elif price_type.upper() == "MAXIMUM":
-        return content_item.get('maximum', 'N/A')
+        return content_arrays['maximum'][positions]
     else:  # MOYEN par défaut
-        return content_item.get('moyen', 'N/A')
+        return content_arrays['moyen'][positions]
 
 # --- Chargement des dictionnaires et des données ---
 load_dictionary()
@@ -537,7 +880,7 @@ def search():
         
         # Recherche des titres correspondants
         if selected_titles:
-            matching_titles = find_matching_titles_in_csv(selected_titles, hierarchical_data)
+            matching_titles = find_matching_titles_in_csv(selected_titles, csv_data)
             print(f"Titres correspondants trouvés: {len(matching_titles)}")
             
             # Si on a aussi un sous-titre
@@ -575,137 +918,187 @@ def search():
     # Si aucun filtre ou aucune correspondance trouvée, recherche globale
     if not search_scope:
         print("Recherche globale...")
-        return search_global(query, price_type, df_search, limit)
+        return search_global(query, price_type, csv_data, limit)
     
     # --- Recherche dans le périmètre restreint ---
     original_terms = [word.lower() for word in query.split() if len(word) > 2]
-    expanded_terms = expand_query(query)
+    expanded_terms = list(expand_query(query))
     
     print(f"Termes originaux: {original_terms}")
     print(f"Termes étendus: {expanded_terms}")
     
-    results_with_scores = []
-    
-    for item in search_scope:
-        designation = item['designation']
-        relevance_score = calculate_relevance_score(designation, original_terms, expanded_terms)
-        
-        if relevance_score > 0:
-            results_with_scores.append({
-                'designation': designation,
-                'prix': get_price_by_type(item, price_type),
-                'unite': item['unite'],
-                'code': item['code'],
-                'score': relevance_score
-            })
-    
-    # Tri des résultats
-    results_with_scores.sort(key=lambda x: x['score'], reverse=True)
-    
+    # Scoring vectorisé du périmètre : un gather NumPy par colonne puis
+    # des masques par terme, au lieu d'un dict Python par article
+    content_arrays = csv_data['content_arrays']
+    positions = np.asarray(search_scope, dtype=np.int64)
+    scores = calculate_relevance_scores(
+        content_arrays['designations_lower'][positions], original_terms, expanded_terms
+    )
+
+    keep = np.flatnonzero(scores > 0)
+    # Tri stable décroissant : même ordre qu'un list.sort(reverse=True)
+    keep = keep[np.argsort(-scores[keep], kind='stable')][:limit]
+    kept_positions = positions[keep]
+    prix = get_price_by_type(content_arrays, kept_positions, price_type)
+
     # Formatage final
     suggestions = []
-    for result in results_with_scores[:limit]:
+    for i, pos in enumerate(kept_positions):
         suggestions.append({
-            "designation": result['designation'],
-            "prix": result['prix'],
-            "unite": result['unite'],
-            "code": result.get('code', ''),
-            "score": round(result['score'], 2)
+            "designation": content_arrays['designations'][pos],
+            "prix": _fmt_price(prix[i]),
+            "unite": content_arrays['unites'][pos],
+            "code": content_arrays['codes'][pos],
+            "score": round(float(scores[keep[i]]), 2)
         })
     
     print(f"--- Réponse hiérarchique --- {len(suggestions)} résultat(s)")
 
     response = app.response_class(
-        response=json.dumps(suggestions, ensure_ascii=False, indent=2),
+        response=json.dumps(suggestions, ensure_ascii=False, separators=(',', ':')),
         status=200,
         mimetype='application/json; charset=utf-8'
     )
     
     return response
 
-def search_global(query, price_type, df_search, limit):
+@lru_cache(maxsize=4096)
+def _encode_query(text):
+    """Encode (et normalise) une requête, avec mémoïsation.
+
+    L'autocomplétion envoie les mêmes textes en boucle : un hit de cache
+    économise un passage complet dans le transformer.
+    """
+    with torch.inference_mode():
+        return model.encode(text, convert_to_tensor=True, normalize_embeddings=True)
+
+def search_global(query, price_type, csv_data, limit):
     """Fonction de recherche globale."""
+    df_search = csv_data['df_search']
     original_terms = [word.lower() for word in query.split() if len(word) > 2]
-    expanded_terms = expand_query(query)
+    expanded_terms = list(expand_query(query))
     
     results_with_scores = []
-    
-    for idx, row in df_search.iterrows():
-        designation = row['Désignation']
-        relevance_score = calculate_relevance_score(designation, original_terms, expanded_terms)
-        
+
+    # Colonnes extraites une fois en tableaux NumPy (pas de Series
+    # intermédiaire par ligne)
+    indices = df_search.index.to_numpy()
+    designations = df_search['Désignation'].to_numpy()
+    unites = df_search['Unité'].to_numpy()
+    minimums = df_search['Minimum'].to_numpy()
+    moyens = df_search['Moyen'].to_numpy()
+    maximums = df_search['Maximum'].to_numpy()
+
+    designations_lower = csv_data.get('search_designations_lower')
+    if designations_lower is None:
+        designations_lower = np.char.lower(designations.astype('U'))
+
+    # Seules les lignes candidates (index inversé) sont scorées, au lieu
+    # de balayer tout le catalogue à chaque requête
+    inverted_index = csv_data.get('inverted_index')
+    if inverted_index is not None:
+        candidate_positions = np.fromiter(
+            sorted(find_candidate_positions(inverted_index, original_terms + expanded_terms,
+                                            designations_lower)),
+            dtype=np.int64
+        )
+    else:
+        candidate_positions = np.arange(len(designations))
+
+    # Scoring du lot de candidats en une passe vectorisée (mêmes barèmes
+    # que la version scalaire) plutôt qu'un appel Python par ligne
+    candidate_scores = calculate_relevance_scores(
+        designations_lower[candidate_positions], original_terms, expanded_terms
+    ) if len(candidate_positions) else []
+
+    for pos, relevance_score in zip(candidate_positions, candidate_scores):
         if relevance_score > 0:
             # Sélection du prix selon le type
             if price_type.upper() == "MINIMUM":
-                prix = row['Minimum']
+                prix = minimums[pos]
             elif price_type.upper() == "MAXIMUM":
-                prix = row['Maximum']
+                prix = maximums[pos]
             else:
-                prix = row['Moyen']
-            
+                prix = moyens[pos]
+
             results_with_scores.append({
-                'index': idx,
-                'designation': designation,
+                'index': indices[pos],
+                'designation': designations[pos],
                 'prix': prix,
-                'unite': row['Unité'],
-                'score': relevance_score
+                'unite': unites[pos],
+                'score': float(relevance_score)
             })
     
-    results_with_scores.sort(key=lambda x: x['score'], reverse=True)
-    
     final_results = []
 
-    if results_with_scores and results_with_scores[0]['score'] > 20:
-        top_score = results_with_scores[0]['score']
-        score_threshold = top_score * 0.5
-
-        for result in results_with_scores:
-            if result['score'] >= score_threshold:
-                final_results.append(result)
-            else:
-                break
+    top_score = max((r['score'] for r in results_with_scores), default=0)
+    if top_score > 20:
+        # Seuls `limit` résultats sont renvoyés : un tas borné
+        # (O(N log k)) remplace le tri complet de la liste
+        final_results = [
+            r for r in heapq.nlargest(limit, results_with_scores, key=lambda x: x['score'])
+            if r['score'] >= top_score * 0.5
+        ]
     else:
         final_results = results_with_scores
         
         try:
             processed_query = preprocess_text(' '.join(expanded_terms), for_similarity=True)
             if processed_query:
-                query_embedding = model.encode(processed_query)
-                
+                query_embedding = _encode_query(processed_query)
+
+                embeddings_matrix = csv_data['embeddings_matrix']
+                row_index = csv_data['row_index']
+
+                # Un seul produit matrice-vecteur (BLAS) sur toute la
+                # bibliothèque au lieu de N appels util.cos_sim
+                scores = torch.mv(embeddings_matrix, query_embedding)
+
+                # Écarte les lignes déjà trouvées par la recherche par mots-clés
                 found_indices = {r['index'] for r in final_results}
-                remaining_df = df_search[~df_search.index.isin(found_indices)]
-                
+                if found_indices:
+                    # Le masque doit vivre sur le même device que scores :
+                    # sur GPU, un tenseur CPU ferait échouer masked_fill
+                    found_mask = torch.tensor([idx in found_indices for idx in row_index],
+                                              device=scores.device)
+                    scores = scores.masked_fill(found_mask, -1.0)
+
+                top_scores, top_positions = torch.topk(scores, min(limit, scores.shape[0]))
+
                 similarities = []
-                for idx, row in remaining_df.iterrows():
-                    similarity = util.cos_sim(query_embedding, row['embeddings']).item()
-                    if similarity > 0.35:
-                        # Sélection du prix selon le type
-                        if price_type.upper() == "MINIMUM":
-                            prix = row['Minimum']
-                        elif price_type.upper() == "MAXIMUM":
-                            prix = row['Maximum']
-                        else:
-                            prix = row['Moyen']
-                        
-                        similarities.append({
-                            'index': idx,
-                            'designation': row['Désignation'],
-                            'prix': prix,
-                            'unite': row['Unité'],
-                            'score': similarity * 10
-                        })
-                
+                for similarity, pos in zip(top_scores.tolist(), top_positions.tolist()):
+                    if similarity <= 0.35:
+                        break  # Scores triés : plus rien au-dessus du seuil
+                    idx = row_index[pos]
+                    row = df_search.loc[idx]
+                    # Sélection du prix selon le type
+                    if price_type.upper() == "MINIMUM":
+                        prix = row['Minimum']
+                    elif price_type.upper() == "MAXIMUM":
+                        prix = row['Maximum']
+                    else:
+                        prix = row['Moyen']
+
+                    similarities.append({
+                        'index': idx,
+                        'designation': row['Désignation'],
+                        'prix': prix,
+                        'unite': row['Unité'],
+                        'score': similarity * 10
+                    })
+
                 final_results.extend(similarities)
-                final_results.sort(key=lambda x: x['score'], reverse=True)
-        
+
         except Exception as e:
             print(f"Erreur durant la recherche par similarité: {e}")
 
+        final_results = heapq.nlargest(limit, final_results, key=lambda x: x['score'])
+
     suggestions = []
     for result in final_results[:limit]:
         suggestions.append({
             "designation": result['designation'],
-            "prix": result['prix'],
+            "prix": _fmt_price(result['prix']),
             "unite": result['unite'],
             "score": round(result['score'], 2)
         })
@@ -713,7 +1106,7 @@ def search_global(query, price_type, df_search, limit):
     print(f"--- Réponse globale --- {len(suggestions)} résultat(s)")
 
     response = app.response_class(
-        response=json.dumps(suggestions, ensure_ascii=False, indent=2),
+        response=json.dumps(suggestions, ensure_ascii=False, separators=(',', ':')),
         status=200,
         mimetype='application/json; charset=utf-8'
     )
@@ -798,6 +1191,7 @@ def update_dictionary():
         if 'term' in data and 'synonyms' in data:
             TECHNICAL_DICTIONARY[data['term']] = data['synonyms']
             save_dictionary()
+            _rebuild_synonym_lookup()
             return jsonify({"status": "success", "message": "Dictionnaire mis à jour"})
         else:
             return jsonify({"error": "Format invalide"}), 400
@@ -817,6 +1211,9 @@ def update_title_dictionary():
         if 'title' in data and 'config' in data:
             TITLE_SUBTITLE_DICTIONARY[data['title']] = data['config']
             save_title_subtitle_dictionary()
+            # Les index pré-calculés dépendent du dictionnaire : on les reconstruit
+            for csv_data in loaded_csvs.values():
+                csv_data['title_match_index'] = build_title_match_index(csv_data['hierarchical_data'])
             return jsonify({"status": "success", "message": "Dictionnaire titres/sous-titres mis à jour"})
         else:
             return jsonify({"error": "Format invalide"}), 400
@@ -849,22 +1246,36 @@ def count_results():
 
     # Sélection du CSV
     if csv_filename and csv_filename in loaded_csvs:
-        df_search = loaded_csvs[csv_filename]['df_search']
+        csv_data = loaded_csvs[csv_filename]
     else:
         if loaded_csvs:
             csv_filename = list(loaded_csvs.keys())[0]
-            df_search = loaded_csvs[csv_filename]['df_search']
+            csv_data = loaded_csvs[csv_filename]
         else:
             return jsonify({"error": "Aucun CSV disponible"}), 500
 
-    expanded_terms = expand_query(query)
-    count = 0
-    
-    for _, row in df_search.iterrows():
-        designation_lower = row['Désignation'].lower()
-        if any(term in designation_lower for term in expanded_terms):
-            count += 1
-    
+    expanded_terms = list(expand_query(query))
+
+    designations_lower = csv_data.get('search_designations_lower')
+    if designations_lower is None:
+        designations_lower = np.char.lower(
+            csv_data['df_search']['Désignation'].astype(str).to_numpy().astype('U')
+        )
+
+    # Comptage multi-motifs en une seule passe : l'index inversé joue le
+    # rôle d'un automate multi-motifs à périmètre fixe — tous les termes
+    # sont confrontés au vocabulaire (mots uniques) en un parcours, au
+    # lieu d'un balayage Boyer-Moore par terme et par désignation.
+    inverted_index = csv_data.get('inverted_index')
+    if inverted_index is not None:
+        count = len(find_candidate_positions(inverted_index, expanded_terms, designations_lower))
+    else:
+        # Repli : masque vectorisé, une passe C par terme
+        mask = np.zeros(len(designations_lower), dtype=bool)
+        for term in expanded_terms:
+            mask |= np.char.find(designations_lower, term) >= 0
+        count = int(mask.sum())
+
     return jsonify({
         "count": count, 
         "query": query, 
@@ -883,4 +1294,9 @@ if __name__ == '__main__':
     print("- /test")
     print("- /dictionary (GET/POST)")
     print("- /title_dictionary (GET/POST)")
-    app.run(port=5000, debug=False, host='127.0.0.1')
\ No newline at end of file
+    # threaded=True : une requête en cours d'inférence ou de lecture CSV
+    # ne bloque plus les autres (pandas et torch relâchent le GIL sur les
+    # phases lourdes). En production, préférer un serveur WSGI à threads
+    # avec préchargement (voir wsgi.py) :
+    #   gunicorn --preload -w 1 -k gthread --threads 8 -b 127.0.0.1:5000 wsgi:app
+    app.run(port=5000, debug=False, host='127.0.0.1', threaded=True)
\ No newline at end of file
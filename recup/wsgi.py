@@ -0,0 +1,19 @@
+# ================================================================================
+# FICHIER: wsgi.py - Point d'entrée WSGI de production (backend recup)
+# ================================================================================
+"""
+Point d'entrée pour un serveur WSGI de production (gunicorn).
+
+Les dictionnaires et les CSV sont chargés à l'import de backend (voir le
+bas de backend.py) : avec --preload, ce travail n'est fait qu'une fois
+dans le processus parent, et les pages mémoire (poids du modèle,
+matrices d'embeddings, loaded_csvs) sont partagées en copy-on-write
+entre les workers — pas de RAM dupliquée ni de rechargement par worker.
+
+    gunicorn --preload -w 1 -k gthread --threads 8 -b 127.0.0.1:5000 wsgi:app
+
+Sur une machine multi-cœurs, augmenter -w multiplie le débit ; garder
+des threads par worker pour que l'inférence et les lectures CSV (qui
+relâchent le GIL) ne bloquent pas les autres requêtes.
+"""
+from backend import app
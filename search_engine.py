@@ -5,18 +5,79 @@
 Moteur de recherche avancé pour le BTP, qui intègre désormais un correcteur
 orthographique pour améliorer la pertinence des résultats.
 """
+import numpy as np
 import pandas as pd
-from sentence_transformers import SentenceTransformer
-from typing import List, Set
+import threading
+from bisect import bisect_left
+from collections import defaultdict
+from typing import List, Optional, Set
 import logging
-from dataclasses import dataclass, asdict
+from dataclasses import dataclass
 
 # Import des modules locaux
-from config import MODEL_CONFIG
+from config import MODEL_CONFIG, SEARCH_THRESHOLDS
 from text_processor import TextProcessor
 from dictionary_manager import DictionaryManager
 from corrector import Corrector # <-- IMPORT DU NOUVEAU MODULE
 
+# Échelle de quantification symétrique des embeddings L2-normalisés :
+# chaque composante ∈ [-1, 1] est projetée sur [-127, 127] en int8.
+INT8_SCALE = 127.0
+
+def quantize_embeddings(embeddings: np.ndarray) -> np.ndarray:
+    """Quantifie une matrice d'embeddings L2-normalisés en int8.
+
+    Divise par 4 la bande passante mémoire du produit matriciel de
+    similarité (le goulot d'étranglement), pour une perte de précision
+    négligeable sur un simple classement par cosinus.
+    """
+    return np.clip(np.round(embeddings * INT8_SCALE), -127, 127).astype(np.int8)
+
+# Sentinelle partagée pour les termes sans aucune ligne correspondante.
+_EMPTY_ROWS = np.empty(0, dtype=np.int32)
+
+def _rows_contain(rows: np.ndarray, pos: int) -> bool:
+    """Teste l'appartenance de `pos` à une liste de positions triée (bisection)."""
+    i = int(np.searchsorted(rows, pos))
+    return i < rows.size and int(rows[i]) == pos
+
+def _topk_desc_numpy(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices des k meilleurs scores, triés par score décroissant (repli NumPy)."""
+    if k >= len(scores):
+        return np.argsort(scores)[::-1]
+    idx = np.argpartition(scores, -k)[-k:]
+    return idx[np.argsort(scores[idx])[::-1]]
+
+try:
+    from numba import njit
+
+    @njit(cache=True, fastmath=True)
+    def _topk_desc(scores, k):
+        """Sélection top-k en une seule passe (tas borné), compilée par numba."""
+        n = scores.shape[0]
+        if k > n:
+            k = n
+        idx = np.full(k, -1, np.int64)
+        vals = np.full(k, -np.inf, np.float64)
+        for i in range(n):
+            s = scores[i]
+            if s > vals[k - 1]:
+                j = k - 1
+                while j > 0 and vals[j - 1] < s:
+                    vals[j] = vals[j - 1]
+                    idx[j] = idx[j - 1]
+                    j -= 1
+                vals[j] = s
+                idx[j] = i
+        return idx
+
+    # Pré-chauffe le JIT à l'import pour ne pas payer la compilation
+    # sur la première requête.
+    _topk_desc(np.zeros(2, dtype=np.float32), 1)
+except ImportError:
+    # numba est une dépendance optionnelle : argpartition fait l'affaire
+    _topk_desc = _topk_desc_numpy
+
 @dataclass
 class SearchResult:
     """Structure de données pour un résultat de recherche."""
@@ -28,19 +89,200 @@ class SearchResult:
     matched_terms: List[str]
     num_matches: int
 
+@dataclass
+class LibraryIndex:
+    """État pré-calculé d'une bibliothèque, construit par prepare().
+
+    Regroupe tout le travail qui ne dépend que du catalogue (tokenisation,
+    index inversé, embeddings, colonnes extraites en ndarrays) : search()
+    ne fait plus que du travail proportionnel à la requête, et le chemin
+    chaud ne touche plus pandas — le DataFrame n'est gardé que pour les
+    appelants qui en ont besoin en dehors de la recherche.
+    """
+    df: pd.DataFrame
+    emb_matrix: Optional[np.ndarray]
+    token_sets: np.ndarray
+    token_index: dict
+    designations: np.ndarray
+    prix: np.ndarray
+    unites: np.ndarray
+
 class BTCSearchEngine:
     """Moteur de recherche avancé pour le BTP."""
     
     def __init__(self, model_name: str = MODEL_CONFIG['name']):
-        self.model = SentenceTransformer(model_name)
+        self.model_name = model_name
+        self._model = None
+        self._model_lock = threading.Lock()
         self.text_processor = TextProcessor()
         self.dictionary_manager = DictionaryManager()
         self.corrector = Corrector() # <-- INITIALISATION DU CORRECTEUR
-        logging.info(f"Moteur de recherche initialisé avec le modèle '{model_name}'.")
+        logging.info(f"Moteur de recherche initialisé (modèle '{model_name}' chargé à la première utilisation).")
+
+    @property
+    def model(self):
+        """Charge le SentenceTransformer à la demande.
+
+        L'import de torch + transformers coûte plusieurs secondes et des
+        centaines de Mo : inutile pour /status ou pour les bibliothèques
+        servies depuis le cache d'embeddings disque.
+        """
+        if self._model is None:
+            with self._model_lock:
+                if self._model is None:
+                    import torch
+                    from sentence_transformers import SentenceTransformer
+                    model = SentenceTransformer(self.model_name)
+                    if torch.cuda.is_available():
+                        # FP16 sur GPU : débit d'inférence doublé pour l'encodage
+                        model = model.half()
+                    else:
+                        # Quantification dynamique int8 des couches linéaires :
+                        # les GEMM passent par les noyaux entiers du CPU.
+                        try:
+                            model[0].auto_model = torch.ao.quantization.quantize_dynamic(
+                                model[0].auto_model, {torch.nn.Linear}, dtype=torch.qint8
+                            )
+                            logging.info("Modèle quantifié en int8 (inférence CPU).")
+                        except Exception as e:
+                            logging.warning(f"Quantification int8 indisponible, FP32 conservé : {e}")
+                    logging.info(f"Modèle '{self.model_name}' chargé.")
+                    self._model = model
+        return self._model
+
+    def rerank(self, query: str, candidates: List[str], batch_size: int = 64) -> List[float]:
+        """Scores cosinus entre la requête et une liste de textes candidats.
+
+        Encode le batch normalisé puis calcule toutes les similarités en
+        un seul produit matrice-vecteur, sous inference_mode (pas de
+        graphe d'autograd).
+        """
+        import torch
+        with torch.inference_mode():
+            cand_emb = self.model.encode(
+                candidates, batch_size=batch_size, convert_to_tensor=True,
+                normalize_embeddings=True, show_progress_bar=False,
+            )
+            query_emb = self.model.encode(query, convert_to_tensor=True, normalize_embeddings=True)
+            return torch.mv(cand_emb, query_emb).tolist()
+
+    def prepare(self, df: pd.DataFrame, emb_matrix: Optional[np.ndarray] = None) -> LibraryIndex:
+        """Construit le LibraryIndex d'une bibliothèque (travail unique).
+
+        À appeler une fois au chargement ; le handle retourné se passe
+        ensuite à search() pour que chaque requête ne refasse ni la
+        tokenisation du catalogue ni la construction de l'index inversé.
+        """
+        token_sets = self.tokenize_designations(df)
+        token_index = self.build_token_index(token_sets)
+        # Colonnes extraites une fois en ndarrays : la construction des
+        # résultats lit des scalaires bruts, sans repasser par pandas
+        designations = df['Désignation'].to_numpy()
+        prix = df['Prix'].to_numpy()
+        unites = df['Unité'].to_numpy()
+        # Le handle est partagé entre tous les threads du serveur : les
+        # tableaux sont verrouillés en lecture seule pour qu'aucune requête
+        # ne puisse muter l'état commun (toute écriture lèverait ValueError).
+        for arr in (token_sets, designations, prix, unites):
+            if arr.flags.writeable:
+                arr.setflags(write=False)
+        if emb_matrix is not None and emb_matrix.flags.writeable:
+            emb_matrix.setflags(write=False)
+        return LibraryIndex(df=df, emb_matrix=emb_matrix,
+                            token_sets=token_sets, token_index=token_index,
+                            designations=designations, prix=prix, unites=unites)
+
+    def tokenize_designations(self, df: pd.DataFrame) -> np.ndarray:
+        """Tokenise toutes les désignations en un tableau de frozensets.
+
+        La normalisation (casse + accents) est faite en deux passes
+        vectorisées sur la colonne entière — mêmes opérations que
+        normalize_text, sans un appel Python par ligne ; seules les rares
+        chaînes gardant des caractères non ASCII repassent par le repli
+        Unicode. À appeler une seule fois au chargement d'une
+        bibliothèque : le résultat se passe ensuite à search() via
+        `token_sets`.
+        """
+        normed = df['Désignation'].astype(str).str.lower().str.translate(TextProcessor._ACCENT_TABLE)
+        rest = ~normed.map(str.isascii)
+        if rest.any():
+            normed.loc[rest] = normed.loc[rest].map(self.text_processor.normalize_text)
+        return np.array([
+            frozenset(self.text_processor.tokenize_btp(d, preserve_technical=True))
+            for d in normed
+        ], dtype=object)
+
+    def build_token_index(self, token_sets: np.ndarray) -> dict:
+        """Construit l'index inversé token -> ids de lignes.
+
+        `vocab` est la liste triée des tokens du catalogue : les tokens
+        commençant par un préfixe donné y forment une plage contiguë,
+        localisable par bisection. À construire une fois au chargement,
+        comme `token_sets`.
+        """
+        postings = defaultdict(list)
+        for pos, tokens in enumerate(token_sets):
+            for token in tokens:
+                postings[token].append(pos)
+        # Listes de positions contiguës en int32 (disposition SoA) : les
+        # positions sont ajoutées en ordre croissant et une seule fois par
+        # ligne (frozenset), donc chaque tableau est trié et sans doublon.
+        postings = {token: np.asarray(rows, dtype=np.int32) for token, rows in postings.items()}
+        for rows in postings.values():
+            rows.setflags(write=False)
+        return {'postings': postings, 'vocab': sorted(postings)}
+
+    def _candidate_positions(self, token_index: dict, terms: Set[str]) -> np.ndarray:
+        """Positions (triées, int32) des lignes pouvant avoir une correspondance flexible.
+
+        La correspondance « flexible » de ce moteur est le startswith
+        bidirectionnel de _get_flexible_matches (référence scalaire), pas
+        une inclusion en milieu de chaîne. Pour chaque terme : plage de
+        préfixe dans le vocabulaire trié (tokens commençant par le terme),
+        puis énumération des préfixes du terme lui-même pour le sens
+        inverse (tokens dont le terme est une extension) — O(|terme|)
+        accès dict, sans balayer ni le vocabulaire ni les lignes.
+        """
+        chunks = [rows for rows in
+                  (self._term_match_rows(token_index, term) for term in terms)
+                  if rows.size]
+        if not chunks:
+            return _EMPTY_ROWS
+        return np.unique(np.concatenate(chunks))
+
+    def _term_match_rows(self, token_index: dict, term: str) -> np.ndarray:
+        """Lignes ayant une correspondance flexible avec un terme (tableau int32 trié).
+
+        Reproduit exactement _get_flexible_matches : la plage de préfixe
+        couvre d_token.startswith(term), l'énumération des préfixes du
+        terme couvre term.startswith(d_token) — y compris les synonymes
+        multi-mots, dont le premier mot est l'un des préfixes énumérés.
+        """
+        postings = token_index['postings']
+        vocab = token_index['vocab']
+        chunks = []
+        i = bisect_left(vocab, term)
+        while i < len(vocab) and vocab[i].startswith(term):
+            chunks.append(postings[vocab[i]])
+            i += 1
+        # term.startswith(token) <=> token est l'un des préfixes de term
+        for end in range(1, len(term)):
+            prefix_rows = postings.get(term[:end])
+            if prefix_rows is not None:
+                chunks.append(prefix_rows)
+        if not chunks:
+            return _EMPTY_ROWS
+        if len(chunks) == 1:
+            return chunks[0]
+        return np.unique(np.concatenate(chunks))
 
     def _get_flexible_matches(self, query_tokens: Set[str], designation_tokens: Set[str]) -> Set[str]:
         """
         Trouve les correspondances flexibles en utilisant startswith.
+
+        Version scalaire de référence : search() passe par l'index inversé
+        (_term_match_rows), qui doit retourner exactement les lignes où
+        cette fonction trouverait au moins une correspondance.
         """
         matches = set()
         for q_token in query_tokens:
@@ -50,62 +292,73 @@ class BTCSearchEngine:
                     break
         return matches
 
-    def search(self, df: pd.DataFrame, query: str, limit: int = 20) -> List[dict]:
+    def search(self, library: "LibraryIndex | pd.DataFrame", query: str,
+               limit: int = 20) -> List[dict]:
         """
         Effectue une recherche optimisée après avoir corrigé la requête.
+
+        `library` est le LibraryIndex retourné par prepare() : DataFrame,
+        matrice d'embeddings (N, D) pour le dernier niveau (similarité
+        sémantique), tokens et index inversé pré-calculés. Un DataFrame nu
+        reste accepté (repli : prepare() est alors refait à chaque appel).
         """
         if not query or len(query.strip()) < 2:
             return []
 
         # --- NOUVELLE ÉTAPE : CORRECTION DE LA REQUÊTE ---
         corrected_query = self.corrector.correct_query(query)
-        
+
         query_norm = self.text_processor.normalize_text(corrected_query)
         query_tokens = set(self.text_processor.tokenize_btp(query_norm, preserve_technical=False))
         num_query_tokens = len(query_tokens)
-        
+
         if not query_tokens:
             return []
 
-        # Pré-traitement des désignations
-        df['norm_designation'] = df['Désignation'].apply(self.text_processor.normalize_text)
-        df['designation_tokens'] = df['norm_designation'].apply(
-            lambda x: set(self.text_processor.tokenize_btp(x, preserve_technical=True))
-        )
+        if not isinstance(library, LibraryIndex):
+            # Repli pour les appelants qui passent encore un DataFrame nu
+            library = self.prepare(library)
+        token_index = library.token_index
+        num_rows = len(library.designations)
 
         # --- Étape 1: Construire la liste D1 ---
-        results_d1 = []
-        for index, row in df.iterrows():
-            matches = self._get_flexible_matches(query_tokens, row['designation_tokens'])
-            if matches:
-                score = len(matches) * 10
-                if query_tokens.intersection(row['designation_tokens']):
-                    score += 5
-
-                results_d1.append(SearchResult(
-                    designation=row['Désignation'], prix=row['Prix'], unite=row['Unité'],
-                    score=score, match_type='Mots-clés partiels (D1)', matched_terms=list(matches),
-                    num_matches=len(matches)
-                ))
-        
-        if not results_d1:
+        # Comptage vectorisé des correspondances : une incrémentation NumPy
+        # par terme sur ses lignes (plutôt qu'une double boucle Python
+        # tokens requête x tokens désignation par ligne) ; les termes
+        # appariés ne sont reconstruits que pour les lignes retenues.
+        postings = token_index['postings']
+        counts = np.zeros(num_rows, dtype=np.int32)
+        exact = np.zeros(num_rows, dtype=bool)
+        term_rows = {term: self._term_match_rows(token_index, term) for term in query_tokens}
+        for term, rows in term_rows.items():
+            if rows.size:
+                counts[rows] += 1
+            exact_rows = postings.get(term)
+            if exact_rows is not None:
+                exact[exact_rows] = True
+
+        # Court-circuit : le score d'une ligne se déduit entièrement de
+        # counts/exact, donc le top-k est choisi sur les tableaux AVANT de
+        # matérialiser le moindre SearchResult — seules `limit` lignes
+        # paient la reconstruction des termes appariés et la lecture des
+        # colonnes, quelle que soit la taille de la liste D1/D2/D3 complète.
+        matched = np.flatnonzero(counts)
+        if matched.size == 0:
             logging.info("Aucun résultat partiel (D1) trouvé. Passage au Niveau 3 (D3).")
         else:
             # --- Étape 2: Logique de filtrage D2 ---
             if num_query_tokens > 1:
-                results_d2 = [r for r in results_d1 if r.num_matches == num_query_tokens]
-                
-                if results_d2:
-                    logging.info(f"Niveau 1 (D2): {len(results_d2)} résultat(s) parfait(s) trouvé(s).")
-                    for r in results_d2:
-                        r.score += 50
-                        r.match_type = 'Tous les mots-clés (D2)'
-                    results_d2.sort(key=lambda r: r.score, reverse=True)
-                    return [asdict(r) for r in results_d2[:limit]]
-
-            logging.info(f"Retourne {len(results_d1)} résultat(s) partiel(s) (D1).")
-            results_d1.sort(key=lambda r: r.score, reverse=True)
-            return [asdict(r) for r in results_d1[:limit]]
+                full = matched[counts[matched] == num_query_tokens]
+                if full.size:
+                    logging.info(f"Niveau 1 (D2): {full.size} résultat(s) parfait(s) trouvé(s).")
+                    scores = counts[full] * 10 + np.where(exact[full], 5, 0) + 50
+                    return self._emit_top_results(library, full, scores, term_rows, limit,
+                                                  'Tous les mots-clés (D2)')
+
+            logging.info(f"Retourne {matched.size} résultat(s) partiel(s) (D1).")
+            scores = counts[matched] * 10 + np.where(exact[matched], 5, 0)
+            return self._emit_top_results(library, matched, scores, term_rows, limit,
+                                          'Mots-clés partiels (D1)')
 
         # --- Étape 3 (D3): Recherche par synonymes ---
         expanded_terms = set(self.dictionary_manager.expand_query(corrected_query))
@@ -113,23 +366,85 @@ class BTCSearchEngine:
 
         if not synonym_terms:
             logging.info("Niveau 3 (D3): Aucun synonyme trouvé.")
+            return self._search_semantic(library, corrected_query, limit)
+
+        syn_counts = np.zeros(num_rows, dtype=np.int32)
+        syn_rows = {term: self._term_match_rows(token_index, term) for term in synonym_terms}
+        for term, rows in syn_rows.items():
+            if rows.size:
+                syn_counts[rows] += 1
+
+        syn_matched = np.flatnonzero(syn_counts)
+        if syn_matched.size:
+            logging.info(f"Niveau 3 (D3): {syn_matched.size} résultat(s) trouvé(s).")
+            return self._emit_top_results(library, syn_matched, syn_counts[syn_matched] * 5,
+                                          syn_rows, limit, 'Synonymes (D3)')
+
+        return self._search_semantic(library, corrected_query, limit)
+
+    def _emit_top_results(self, library: LibraryIndex, positions: np.ndarray,
+                          scores: np.ndarray, term_map: dict, limit: int,
+                          match_type: str) -> List[dict]:
+        """Matérialise le top-k de positions candidates en dictionnaires de résultats.
+
+        Tri stable décroissant sur les scores (mêmes égalités départagées
+        par position croissante que le tri de liste qu'il remplace), puis
+        construction des résultats pour les seules lignes émises, à partir
+        des colonnes ndarrays du handle (aucun passage par pandas).
+        """
+        order = np.argsort(-scores, kind='stable')[:limit]
+        designations = library.designations
+        prix = library.prix
+        unites = library.unites
+        results = []
+        for sel in order:
+            pos = int(positions[sel])
+            matches = [term for term, rows in term_map.items() if _rows_contain(rows, pos)]
+            results.append(SearchResult(
+                designation=designations[pos], prix=prix[pos], unite=unites[pos],
+                score=int(scores[sel]), match_type=match_type, matched_terms=matches,
+                num_matches=len(matches)
+            ).__dict__)
+        return results
+
+    def _search_semantic(self, library: LibraryIndex, query: str, limit: int) -> List[dict]:
+        """
+        Niveau 4 (D4) : similarité sémantique sur la matrice d'embeddings.
+        Un seul produit matrice-vecteur (BLAS) remplace la boucle Python par ligne.
+        """
+        emb_matrix = library.emb_matrix
+        if emb_matrix is None or len(emb_matrix) == 0:
+            logging.info("Aucun résultat trouvé après toutes les étapes.")
             return []
 
-        results_d3 = []
-        for index, row in df.iterrows():
-            matches = self._get_flexible_matches(synonym_terms, row['designation_tokens'])
-            if matches:
-                score = len(matches) * 5
-                results_d3.append(SearchResult(
-                    designation=row['Désignation'], prix=row['Prix'], unite=row['Unité'],
-                    score=score, match_type='Synonymes (D3)', matched_terms=list(matches),
-                    num_matches=len(matches)
-                ))
-
-        if results_d3:
-            logging.info(f"Niveau 3 (D3): {len(results_d3)} résultat(s) trouvé(s).")
-            results_d3.sort(key=lambda r: r.score, reverse=True)
-            return [asdict(r) for r in results_d3[:limit]]
+        query_emb = self.model.encode(query, convert_to_numpy=True, normalize_embeddings=True)
+        if emb_matrix.dtype == np.int8:
+            # Produit scalaire entier avec accumulation int32 ; le facteur
+            # d'échelle au carré ramène le score dans [-1, 1].
+            q_i8 = quantize_embeddings(query_emb)
+            scores = (emb_matrix @ q_i8.astype(np.int32)).astype(np.float32) / (INT8_SCALE * INT8_SCALE)
+        else:
+            scores = emb_matrix.astype(np.float32) @ query_emb.astype(np.float32)
+
+        threshold = SEARCH_THRESHOLDS['similarity_threshold']
+        designations = library.designations
+        prix = library.prix
+        unites = library.unites
+        results_d4 = []
+        for idx in _topk_desc(scores, limit):
+            similarity = float(scores[idx])
+            if similarity < threshold:
+                break
+            pos = int(idx)
+            results_d4.append(SearchResult(
+                designation=designations[pos], prix=prix[pos], unite=unites[pos],
+                score=round(similarity * 100, 2), match_type='Similarité sémantique (D4)',
+                matched_terms=[], num_matches=0
+            ))
+
+        if results_d4:
+            logging.info(f"Niveau 4 (D4): {len(results_d4)} résultat(s) trouvé(s).")
+            return [r.__dict__ for r in results_d4]
 
         logging.info("Aucun résultat trouvé après toutes les étapes.")
         return []
@@ -7,7 +7,8 @@ Fournit des outils pour normaliser, tokeniser et extraire des caractéristiques
 techniques des textes de désignation.
 """
 import re
-from typing import List, Dict
+from functools import lru_cache
+from typing import Dict, Tuple
 import unicodedata
 
 class TextProcessor:
@@ -36,16 +37,36 @@ class TextProcessor:
         'elec': 'électricité', 'plomb': 'plomberie', 'menuis': 'menuiserie'
     }
 
+    # Table de translittération des accents du français : str.translate est
+    # une seule passe C, là où la décomposition Unicode travaille caractère
+    # par caractère en Python.
+    _ACCENT_TABLE = str.maketrans('àâäéèêëïîôöùûüç', 'aaaeeeeiioouuuc')
+
+    # Alternation unique compilée à la définition de la classe : une seule
+    # passe de substitution remplace une boucle re.sub par abréviation.
+    # Tri par longueur décroissante pour qu'un préfixe ("alu") ne masque
+    # pas une abréviation plus longue ("allu").
+    ABBREV_RE = re.compile(
+        r'\b(' + '|'.join(re.escape(abbrev) for abbrev in
+                          sorted(ABBREVIATIONS_BTP, key=len, reverse=True)) + r')\b'
+    )
+
     @staticmethod
+    @lru_cache(maxsize=8192)
     def normalize_text(text: str) -> str:
-        """Normalise un texte : accents, casse, et caractères spéciaux."""
+        """Normalise un texte : accents, casse, et caractères spéciaux.
+
+        Mémoïsée : l'autocomplétion renvoie les mêmes requêtes en boucle,
+        et les désignations se répètent entre bibliothèques.
+        """
         if not isinstance(text, str):
             return ""
-        # Normalisation Unicode pour décomposer les caractères accentués
-        text = unicodedata.normalize('NFD', text.lower())
-        # Suppression des caractères diacritiques (accents)
-        text = ''.join(char for char in text if unicodedata.category(char) != 'Mn')
-        return text
+        text = text.lower().translate(TextProcessor._ACCENT_TABLE)
+        if text.isascii():
+            return text
+        # Repli pour les diacritiques hors table : décomposition Unicode
+        text = unicodedata.normalize('NFD', text)
+        return ''.join(char for char in text if unicodedata.category(char) != 'Mn')
 
     @staticmethod
     def extract_technical_features(text: str) -> Dict[str, list]:
@@ -74,13 +95,18 @@ class TextProcessor:
         return features
 
     @staticmethod
-    def tokenize_btp(text: str, preserve_technical: bool = True) -> List[str]:
-        """Tokenisation intelligente qui préserve les termes techniques et gère les abréviations."""
+    @lru_cache(maxsize=8192)
+    def tokenize_btp(text: str, preserve_technical: bool = True) -> Tuple[str, ...]:
+        """Tokenisation intelligente qui préserve les termes techniques et gère les abréviations.
+
+        Mémoïsée sur (text, preserve_technical) ; retourne un tuple
+        immuable, partagé entre les hits de cache.
+        """
         text = text.lower()
 
-        # Expansion des abréviations avant la tokenisation
-        for abbrev, full in TextProcessor.ABBREVIATIONS_BTP.items():
-            text = re.sub(r'\b' + re.escape(abbrev) + r'\b', full, text)
+        # Expansion des abréviations avant la tokenisation, en une passe
+        text = TextProcessor.ABBREV_RE.sub(
+            lambda m: TextProcessor.ABBREVIATIONS_BTP[m.group(1)], text)
 
         # Protège les termes techniques en remplaçant temporairement les espaces
         if preserve_technical:
@@ -99,5 +125,5 @@ class TextProcessor:
             if token_restored not in TextProcessor.STOP_WORDS_BTP or any(char.isdigit() for char in token_restored):
                 if len(token_restored) > 1:
                     filtered_tokens.append(token_restored)
-        
-        return filtered_tokens
+
+        return tuple(filtered_tokens)
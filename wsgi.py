@@ -0,0 +1,19 @@
+# ================================================================================
+# FICHIER: wsgi.py - Point d'entrée WSGI de production
+# ================================================================================
+"""
+Point d'entrée pour un serveur WSGI de production (gunicorn).
+
+Le serveur de développement Werkzeug est mono-thread : chaque requête
+/search (y compris le passage dans le transformer) bloquait toutes les
+autres. Lancement recommandé — un seul worker pour partager le modèle et
+le cache d'embeddings, plusieurs threads pour la concurrence E/S :
+
+    gunicorn -w 1 -k gthread --threads 8 -b 0.0.0.0:7860 wsgi:app
+"""
+from app import app, load_startup_library, warm_libraries_in_background
+
+load_startup_library()
+# Les autres bibliothèques se chargent en arrière-plan pendant que le
+# serveur répond déjà aux requêtes.
+warm_libraries_in_background()